@@ -1,41 +1,106 @@
-import os
+import asyncio
+import hashlib
+import json
 import constants
 import schema
 from tqdm.asyncio import tqdm
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
 from fastapi.encoders import jsonable_encoder
 from pathlib import Path
-from ingestion.stock_utils import get_stocks_by_symbol, Stock
-from ingestion.file_utils import get_available_filings, Filing, load_pdf
-from pytickersymbols import PyTickerSymbols
-from pymongo.errors import DuplicateKeyError
-from llama_index.storage.index_store.mongodb import MongoIndexStore
-from llama_index.storage.docstore.mongodb import MongoDocumentStore
-from llama_index.vector_stores.mongodb import MongoDBAtlasVectorSearch
+import download_sec_docs
+from ingestion.stock_utils import Stock
+from ingestion.symbol_index import get_symbol_index
+from ingestion.file_utils import (
+    get_available_filings, Filing, load_pdf, iter_pdf, DOCUMENT_LOADERS, DOCUMENT_PAGE_ITERATORS,
+    afetch_document_content, resolve_local_document_path,
+)
+from ingestion.content_hash import (
+    assign_chunk_ids, assign_page_ids, file_sha256, page_id, source_stat, text_sha256
+)
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from llama_index.core import StorageContext, VectorStoreIndex, load_indices_from_storage
+from llama_index.core.schema import BaseNode, Document as LlamaIndexDocument
 from llm import LLM
+from api.storage import get_storage_context
+from api.executor import get_ingestion_executor
+from ingestion.embedding import get_batch_embedder
+from ingestion.parsing import get_document_parser
+from ingestion.pipeline import Pipeline, Stage
+from ingestion.streaming import stream_document_pages
 from logger import logger
 
 
-async def upsert_document_by_url(collection, document: schema.Document) -> schema.Document:
+@dataclass
+class BulkUpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # _id of every document the bulk write inserted, by URL
+    inserted_ids: Dict[str, ObjectId] = field(default_factory=dict)
+
+
+def _document_fields(doc: schema.Document) -> Dict:
     """
-    Upsert a document by URL.
+    The fields an upsert sets. Metadata is set key by key, so keys the ingestion adds later (such as
+    the content hashes) are not wiped when a filing's metadata is refreshed.
     """
-    logger.debug({"url": str(document.url), **document.dict()})
-    insert_result = await collection.insert_one({"url": str(document.url), **document.dict()})
-    document.id = insert_result.inserted_id
-    logger.debug(document)
-    return document
+    fields = {"url": str(doc.url), **doc.dict()}
+    for key, value in (fields.pop("metadata_map", None) or {}).items():
+        fields[f"metadata_map.{getattr(key, 'value', key)}"] = value
+    return fields
+
+
+async def upsert_documents_by_url(collection, documents: List[schema.Document]) -> BulkUpsertResult:
+    """
+    Upserts documents by URL with a single unordered bulk write. Documents already stored get their
+    metadata refreshed; inserted documents get their `id` set.
+    """
+    if not documents:
+        return BulkUpsertResult()
+    operations = [UpdateOne({"url": str(doc.url)}, {"$set": _document_fields(doc)}, upsert=True) for doc in documents]
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        upserted_ids, matched, modified, raced = result.upserted_ids, result.matched_count, result.modified_count, 0
+    except BulkWriteError as e:
+        # Another writer inserted some of the URLs between the upserts' lookup and insert; those
+        # documents are stored, just not by this write.
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+        upserted_ids = {upserted["index"]: upserted["_id"] for upserted in e.details["upserted"]}
+        matched, modified, raced = e.details["nMatched"], e.details["nModified"], len(e.details["writeErrors"])
 
+    for i, _id in upserted_ids.items():
+        documents[i].id = _id
+    bulk_result = BulkUpsertResult(
+        inserted=len(upserted_ids),
+        updated=modified,
+        unchanged=matched - modified + raced,
+        inserted_ids={str(documents[i].url): _id for i, _id in upserted_ids.items()},
+    )
+    logger.info(
+        f"Bulk upserted {len(documents)} documents: {bulk_result.inserted} inserted, "
+        f"{bulk_result.updated} updated, {bulk_result.unchanged} unchanged"
+    )
+    return bulk_result
 
-async def upsert_document(stock: Stock, filing: Filing, url_base: str, collection):
+
+def document_url(filing: Filing, url_base: str) -> str:
     """
-    Upserts an SEC document with metadata into the MongoDB collection.
+    The URL a filing's document is stored under, which also identifies it in the collection.
     """
-    logger.info("Upserting document")
     doc_path = Path(filing.file_path).relative_to(constants.DEFAULT_OUTPUT_DIR)
-    url_path = f"{url_base.rstrip('/')}/{str(doc_path).lstrip('/')}"
+    return f"{url_base.rstrip('/')}/{str(doc_path).lstrip('/')}"
+
+
+def build_sec_document(stock: Stock, filing: Filing, url_base: str) -> schema.Document:
+    """
+    Builds the SEC document with metadata stored for a filing.
+    """
+    url_path = document_url(filing, url_base)
     doc_type = schema.SecDocumentTypeEnum.TEN_K if filing.filing_type == "10-K" else schema.SecDocumentTypeEnum.TEN_Q
 
     sec_doc_metadata = schema.SecDocumentMetadata(
@@ -55,75 +120,544 @@ async def upsert_document(stock: Stock, filing: Filing, url_base: str, collectio
         schema.DocumentMetadataKeysEnum.SEC_DOCUMENT: jsonable_encoder(sec_doc_metadata.dict(exclude_none=True))
     }
     doc = schema.Document(url=str(url_path), metadata_map=metadata_map)
-    logger.debug(f"Document to insert: {doc}")
+    logger.debug(f"Document to upsert: {doc}")
+    return doc
 
-    try:
-        doc = await upsert_document_by_url(collection, doc)
-        build_doc_id_to_index_map([doc])
-        yield {"event": "vector", "data": f"Stored in Vector DB {doc.url}."}
-    except DuplicateKeyError:
-        logger.info(f"Duplicate key error: Document with URL {doc.url} already exists.")
-        yield {"event": "duplicate", "data": f"Duplicate record found for {doc.url}."}
-    except Exception as e:
-        logger.exception("An error occurred while inserting the document.")
-        raise e
+
+async def async_sec_download(**kwargs):
+    """
+    Runs `download_sec_docs.sec_download` off the event loop, streaming its progress as SSE events
+    while tickers and filings complete. Errors of the download phase are raised once the events
+    before them have been sent.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    def progress(event: str, message: str) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, {"event": event, "data": message})
+
+    # The download and pdf conversion can take minutes, so they run on a thread of their own
+    # rather than holding one of the ingestion executor's threads that parse, embed and write
+    download = asyncio.ensure_future(asyncio.to_thread(download_sec_docs.sec_download, progress=progress, **kwargs))
+    # Scheduled after every progress callback the download made before returning
+    download.add_done_callback(lambda _: events.put_nowait(finished))
+    while (event := await events.get()) is not finished:
+        yield event
+    await download
+    yield {"event": "downloaded_all", "data": "Finished downloading filings."}
+
+
+@dataclass
+class IngestionPlan:
+    """Which of the available filings an ingestion run processes."""
+
+    filings: int = 0
+    new: List[Filing] = field(default_factory=list)
+    existing: List[Filing] = field(default_factory=list)
+    # Stored filings whose source file changed since they were indexed: their document id and
+    # content hashes, by URL
+    changed: Dict[str, Tuple[ObjectId, schema.DocumentContentHashes]] = field(default_factory=dict)
+    # Filings of unknown symbols and, when resuming, the ones an earlier attempt completed
+    skipped: List[Filing] = field(default_factory=list)
+    to_ingest: List[Filing] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "filings": self.filings,
+            "new": len(self.new),
+            "existing": len(self.existing),
+            "changed": len(self.changed),
+            "skipped": len(self.skipped),
+            "to_ingest": len(self.to_ingest),
+        }
+
+
+async def plan_ingestion(
+    filings: List[Filing],
+    stocks_dict: Dict[str, Stock],
+    url_base: str,
+    collection,
+    completed: Optional[Set[str]] = None,
+) -> IngestionPlan:
+    """
+    Looks up the URLs of all candidate filings in a few indexed `$in` queries, so filings already
+    stored are left out before any of them is processed, unless their source file changed since
+    they were indexed. When resuming (`completed` is given), stored filings the earlier attempt did
+    not complete stay in the plan to be indexed again.
+    """
+    plan = IngestionPlan(filings=len(filings))
+    candidates: Dict[str, Filing] = {}
+    for filing in filings:
+        url = document_url(filing, url_base)
+        if filing.symbol not in stocks_dict or (completed is not None and url in completed):
+            plan.skipped.append(filing)
+        else:
+            candidates[url] = filing
+
+    urls = list(candidates)
+    hashes_field = f"metadata_map.{schema.DocumentMetadataKeysEnum.CONTENT_HASHES.value}"
+    existing: Dict[str, dict] = {}
+    for i in range(0, len(urls), constants.INGESTION_PLAN_LOOKUP_BATCH_SIZE):
+        cursor = collection.find({"url": {"$in": urls[i:i + constants.INGESTION_PLAN_LOOKUP_BATCH_SIZE]}}, {"url": 1, hashes_field: 1})
+        existing.update({document["url"]: document async for document in cursor})
+
+    for url, filing in candidates.items():
+        (plan.existing if url in existing else plan.new).append(filing)
+
+    # Documents indexed before content hashes were recorded count as unchanged
+    previous = {
+        url: (candidates[url], document["_id"], schema.DocumentContentHashes(**hashes))
+        for url, document in existing.items()
+        if (hashes := document.get("metadata_map", {}).get(schema.DocumentMetadataKeysEnum.CONTENT_HASHES.value))
+    }
+    changed_urls = await get_ingestion_executor().run(
+        find_changed_sources, {url: (filing, hashes) for url, (filing, _, hashes) in previous.items()}
+    )
+    plan.changed = {url: previous[url][1:] for url in changed_urls}
+
+    if completed is not None:
+        plan.to_ingest = list(candidates.values())
     else:
-        yield {"event": "upsert", "data": f"Upserted document for {filing.symbol}, filing type {filing.filing_type}, quarter {filing.quarter}"}
+        plan.to_ingest = plan.new + [candidates[url] for url in changed_urls]
+    logger.info(f"Ingestion plan: {plan.summary()}")
+    return plan
 
 
-async def async_upsert_documents_from_filings(tickers, collection):
+def find_changed_sources(previous: Dict[str, Tuple[Filing, schema.DocumentContentHashes]]) -> List[str]:
+    """
+    Returns the URLs whose local source file no longer matches the recorded hash. Files are only
+    hashed when their size or modification time changed.
+    """
+    changed = []
+    for url, (filing, hashes) in previous.items():
+        try:
+            stat = source_stat(filing.file_path)
+        except FileNotFoundError:
+            continue
+        if stat == {"source_size": hashes.source_size, "source_mtime_ns": hashes.source_mtime_ns}:
+            continue
+        if file_sha256(filing.file_path) != hashes.source_sha256:
+            changed.append(url)
+    return changed
+
+
+@dataclass
+class IngestionItem:
+    """A document on its way through the ingestion pipeline."""
+
+    doc: schema.Document
+    content: Optional[bytes] = None
+    llama_index_docs: Optional[List[LlamaIndexDocument]] = None
+    # Nodes to embed and write: all of a new document's, only the changed ones of a changed document
+    nodes: Optional[List[BaseNode]] = None
+    # Set when the document's index is already stored, so it is not parsed or embedded again
+    indexed: bool = False
+    # What the stored index was built from, for documents whose source changed
+    previous: Optional[schema.DocumentContentHashes] = None
+    hashes: Optional[schema.DocumentContentHashes] = None
+    stale_node_ids: List[str] = field(default_factory=list)
+
+
+async def async_upsert_documents_from_filings(
+    tickers,
+    collection,
+    source: schema.DocumentSourceEnum = schema.DocumentSourceEnum.PDF,
+    completed: Optional[Set[str]] = None,
+    on_indexed: Optional[Callable[[List[schema.Document]], Awaitable[None]]] = None,
+):
     """
     Streams filings upserts and event publishing as SSE.
+    Document text is extracted from the filings' `source` primary documents. Filings go through a
+    pipeline of stages (store, fetch, parse, chunk, embed, write) that each run concurrently with
+    the others, connected by bounded queues. Documents are embedded and written in batches of
+    `INDEX_BUILD_DOCUMENT_BATCH`, and the stages' throughput and queue depths are sent as
+    `pipeline` events.
+
+    The first event is the ingestion plan: filings already stored are counted and left out before
+    the pipeline starts, except those whose source file changed. For those only the chunks that
+    changed are embedded and written, and the chunks that disappeared are deleted. Resumable runs
+    pass the URLs of the documents an earlier attempt finished as `completed`; those filings are
+    skipped and documents stored but not finished are indexed again.
     """
     url_base = f"https://{constants.BUCKET_NAME}.s3.amazonaws.com"
-    filings = get_available_filings(tickers)
-    stocks_data = PyTickerSymbols()
-    stocks_dict = get_stocks_by_symbol(stocks_data.get_all_indices())
+    executor = get_ingestion_executor()
+    filings = await executor.run(get_available_filings, tickers, source=source)
+    document_loader = DOCUMENT_LOADERS[source]
+    page_iterator = DOCUMENT_PAGE_ITERATORS[source]
+    stocks_dict = (await executor.run(get_symbol_index)).stocks
+    events: asyncio.Queue = asyncio.Queue()
 
-    for filing in tqdm(filings, desc="Upserting documents from filings"):
+    plan = await plan_ingestion(filings, stocks_dict, url_base, collection, completed)
+    yield {"event": "plan", "data": json.dumps(plan.summary())}
+    for filing in plan.skipped:
         if filing.symbol not in stocks_dict:
-            yield {"event": "error", "data": f"Symbol {filing.symbol} not found in stocks_dict. Skipping."}
-            continue
+            yield {"event": "error", "data": f"Symbol {filing.symbol} not found in the symbol index. Skipping."}
+        else:
+            yield {"event": "skipped", "data": f"Already ingested {document_url(filing, url_base)}."}
+
+    async def store(filings: List[Filing]) -> List[IngestionItem]:
+        to_store = [(filing, build_sec_document(stocks_dict[filing.symbol], filing, url_base)) for filing in filings]
+
+        try:
+            result = await upsert_documents_by_url(collection, [doc for _, doc in to_store])
+        except Exception as e:
+            logger.exception("An error occurred while upserting the documents.")
+            raise e
+        events.put_nowait({
+            "event": "bulk_upsert",
+            "data": f"Stored {len(to_store)} documents: {result.inserted} inserted, {result.updated} updated, "
+                    f"{result.unchanged} unchanged.",
+        })
+
+        # Documents stored before are only indexed again when resuming, as an interrupted run may
+        # have stored them without finishing their index
+        existing_ids = {}
+        # Changed documents already have their id from the plan
+        existing_urls = [
+            doc.url for _, doc in to_store if doc.url not in result.inserted_ids and doc.url not in plan.changed
+        ]
+        if completed is not None and existing_urls:
+            async for existing in collection.find({"url": {"$in": existing_urls}}, {"_id": 1, "url": 1}):
+                existing_ids[existing["url"]] = existing["_id"]
+
+        items = []
+        for filing, doc in to_store:
+            if doc.url in result.inserted_ids:
+                events.put_nowait({"event": "upsert", "data": f"Upserted document for {filing.symbol}, filing type {filing.filing_type}, quarter {filing.quarter}"})
+                items.append(IngestionItem(doc))
+                continue
+            if doc.url in plan.changed:
+                events.put_nowait({"event": "changed", "data": f"Source of {doc.url} changed, updating its index."})
+                doc.id, previous = plan.changed[doc.url]
+                items.append(IngestionItem(doc, previous=previous))
+                continue
+            events.put_nowait({"event": "duplicate", "data": f"Duplicate record found for {doc.url}."})
+            if doc.url in existing_ids:
+                doc.id = existing_ids[doc.url]
+                items.append(IngestionItem(doc))
+        return items
+
+    async def fetch(item: IngestionItem) -> IngestionItem:
+        # Documents without a local copy are downloaded without blocking the event loop
+        item.content = await afetch_document_content(item.doc)
+        return item
+
+    async def parse(item: IngestionItem) -> IngestionItem:
+        storage_context = get_storage_context()
+        if item.previous is None:
+            item.indexed = await executor.run(index_is_stored, storage_context, str(item.doc.id))
+        if not item.indexed and document_size(item.doc, item.content) >= constants.INGESTION_STREAMING_MIN_BYTES:
+            # Large documents go through every step here, a window of pages at a time
+            item.hashes = await executor.run(
+                stream_document, storage_context, item.doc, page_iterator, item.content, item.previous
+            )
+        elif not item.indexed:
+            item.llama_index_docs, item.hashes = await executor.run(
+                parse_document, storage_context, item.doc, document_loader, item.content, item.previous
+            )
+        item.content = None
+        return item
+
+    async def chunk(item: IngestionItem) -> IngestionItem:
+        if item.llama_index_docs is not None:
+            nodes = await executor.run(chunk_documents, str(item.doc.id), item.llama_index_docs)
+            item.hashes.chunks = [node.node_id for node in nodes]
+            previous_chunks = set(item.previous.chunks) if item.previous is not None else set()
+            item.nodes = [node for node in nodes if node.node_id not in previous_chunks]
+            item.stale_node_ids = sorted(previous_chunks - set(item.hashes.chunks))
+        item.llama_index_docs = None
+        return item
+
+    async def embed(items: List[IngestionItem]) -> List[IngestionItem]:
+        events.put_nowait({"event": "indexing", "data": f"Indexing {len(items)} documents."})
+        await executor.run(embed_nodes, [node for item in items if item.nodes for node in item.nodes])
+        return items
 
-        stock = stocks_dict[filing.symbol]
+    async def write(items: List[IngestionItem]) -> List[IngestionItem]:
+        built = [item for item in items if item.hashes is not None]
+        try:
+            await executor.run(
+                write_indices,
+                get_storage_context(),
+                {str(item.doc.id): item.nodes or [] for item in built},
+                [node_id for item in built for node_id in item.stale_node_ids],
+            )
+            await record_content_hashes(collection, {item.doc.id: item.hashes for item in built})
+        except Exception as e:
+            logger.exception("An error occurred while indexing the documents.")
+            raise e
+        documents = [item.doc for item in items]
+        if on_indexed is not None:
+            await on_indexed(documents)
+        for doc in documents:
+            events.put_nowait({"event": "vector", "data": f"Stored in Vector DB {doc.url}."})
+        return items
 
-        async for event in upsert_document(stock, filing, url_base, collection):
-            yield event
+    batch = constants.INDEX_BUILD_DOCUMENT_BATCH
+    pipeline = Pipeline([
+        Stage(
+            "store",
+            store,
+            concurrency=constants.PIPELINE_STORE_CONCURRENCY,
+            queue_size=constants.MONGO_BULK_WRITE_BATCH_SIZE,
+            batch_size=constants.MONGO_BULK_WRITE_BATCH_SIZE,
+        ),
+        Stage("fetch", fetch, concurrency=constants.DOCUMENT_FETCH_CONCURRENCY, queue_size=batch),
+        Stage("parse", parse, concurrency=constants.PIPELINE_PARSE_CONCURRENCY, queue_size=batch),
+        Stage("chunk", chunk, concurrency=constants.PIPELINE_PARSE_CONCURRENCY, queue_size=batch),
+        Stage("embed", embed, queue_size=2 * batch, batch_size=batch),
+        Stage("write", write, queue_size=2 * batch, batch_size=batch),
+    ])
+    run = asyncio.ensure_future(pipeline.run(tqdm(plan.to_ingest, desc="Upserting documents from filings")))
+    next_event = None
+    try:
+        while True:
+            next_event = next_event or asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait(
+                {next_event, run}, timeout=constants.PIPELINE_STATS_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                yield next_event.result()
+                next_event = None
+            elif run in done:
+                break
+            else:
+                yield {"event": "pipeline", "data": json.dumps(pipeline.stats())}
+        while not events.empty():
+            yield events.get_nowait()
+        await run
+    finally:
+        # Stops the pipeline when the client goes away before it finished
+        run.cancel()
+        if next_event is not None:
+            next_event.cancel()
+    yield {"event": "pipeline", "data": json.dumps(pipeline.stats())}
 
     yield {"event": "done", "data": "Completed processing all filings."}
 
-def build_doc_id_to_index_map(documents: List[schema.Document]) -> Dict[str, VectorStoreIndex]:
+
+def index_is_stored(storage_context: StorageContext, doc_id: str) -> bool:
+    return storage_context.index_store.get_index_struct(doc_id) is not None
+
+
+def load_document(
+    doc: schema.Document,
+    document_loader: Callable[..., List[LlamaIndexDocument]] = load_pdf,
+    content: Optional[bytes] = None,
+) -> List[LlamaIndexDocument]:
     """
-    Builds a mapping of document IDs to index objects.
+    Loads a document's pages with `document_loader`, from `content` when it was prefetched, with
+    stable page ids.
     """
-    docstore = MongoDocumentStore.from_uri(uri=os.environ["MONGODB_URI"], db_name=constants.DB_NAME, namespace=constants.DOCSTORE_NAMESPACE)
-    vector_store = MongoDBAtlasVectorSearch(
-        db_name=constants.DB_NAME,
-        collection_name=constants.VECTOR_COLLECTION_NAME,
-        vector_index_name=constants.VECTOR_INDEX_NAME,
-        relevance_score_fn="cosine"
+    if content is not None:
+        llama_index_docs = document_loader(doc, content=content)
+    else:
+        llama_index_docs = document_loader(doc)
+    assign_page_ids(str(doc.id), llama_index_docs)
+    return llama_index_docs
+
+
+def hash_source(doc: schema.Document, content: Optional[bytes] = None) -> Dict:
+    """The `DocumentContentHashes` fields describing a document's source file."""
+    fields = {}
+    local_path = resolve_local_document_path(doc)
+    if local_path is not None:
+        # The stat lets the next plan skip hashing files that were not touched
+        fields.update(source_stat(local_path))
+    if content is not None:
+        fields.update(source_sha256=hashlib.sha256(content).hexdigest(), source_size=len(content))
+    elif local_path is not None:
+        fields["source_sha256"] = file_sha256(local_path)
+    return fields
+
+
+def hash_document(
+    doc: schema.Document, llama_index_docs: List[LlamaIndexDocument], content: Optional[bytes] = None
+) -> schema.DocumentContentHashes:
+    return schema.DocumentContentHashes(
+        text_sha256=text_sha256(llama_index_docs), pages=len(llama_index_docs), **hash_source(doc, content)
     )
-    index_store = MongoIndexStore.from_uri(uri=os.environ["MONGODB_URI"], db_name=constants.DB_NAME, namespace=constants.INDEX_NAMESPACE)
 
-    storage_context = StorageContext.from_defaults(docstore=docstore, vector_store=vector_store, index_store=index_store)
 
-    try:
-        index_ids = [str(doc.id) for doc in documents]
-        indices = load_indices_from_storage(storage_context, index_ids=index_ids)
-        doc_id_to_index = dict(zip(index_ids, indices))
-    except ValueError:
-        doc_id_to_index = {}
-        for doc in documents:
-            llama_index_docs = load_pdf(doc)
-            storage_context.docstore.add_documents(llama_index_docs)
-            index = VectorStoreIndex.from_documents(
-                llama_index_docs,
-                storage_context=storage_context,
-                embed_model=LLM.embedding_model
-            )
-            index.set_index_id(str(doc.id))
-            doc_id_to_index[str(doc.id)] = index
+def document_size(doc: schema.Document, content: Optional[bytes] = None) -> int:
+    """Size of a document's source, or 0 when it has neither prefetched content nor a local copy."""
+    if content is not None:
+        return len(content)
+    local_path = resolve_local_document_path(doc)
+    return local_path.stat().st_size if local_path is not None else 0
+
+
+def store_pages(
+    storage_context: StorageContext,
+    llama_index_docs: List[LlamaIndexDocument],
+    previous: Optional[schema.DocumentContentHashes] = None,
+) -> None:
+    """
+    Adds pages to the docstore. When the document was stored before, unchanged pages are left alone.
+    """
+    docstore = storage_context.docstore
+    changed = [
+        page for page in llama_index_docs
+        if previous is None or docstore.get_document_hash(page.get_doc_id()) != page.hash
+    ]
+    docstore.add_documents(changed)
+    for page in changed:
+        docstore.set_document_hash(page.get_doc_id(), page.hash)
+
+
+def delete_pages_after(
+    storage_context: StorageContext, doc_id: str, page_count: int, previous: Optional[schema.DocumentContentHashes]
+) -> None:
+    """Deletes the pages a document had past its new end."""
+    if previous is not None:
+        for page_index in range(page_count, previous.pages):
+            storage_context.docstore.delete_document(page_id(doc_id, page_index), raise_error=False)
+
+
+def parse_document(
+    storage_context: StorageContext,
+    doc: schema.Document,
+    document_loader: Callable[..., List[LlamaIndexDocument]] = load_pdf,
+    content: Optional[bytes] = None,
+    previous: Optional[schema.DocumentContentHashes] = None,
+) -> Tuple[Optional[List[LlamaIndexDocument]], schema.DocumentContentHashes]:
+    """
+    Loads, hashes and stores a document's pages. Returns no pages when the text is the same as
+    `previous` (such as a re-rendered pdf), as the document's nodes are then unchanged too.
+    """
+    llama_index_docs = load_document(doc, document_loader, content)
+    hashes = hash_document(doc, llama_index_docs, content)
+    if previous is not None and previous.text_sha256 == hashes.text_sha256:
+        hashes.chunks = previous.chunks
+        return None, hashes
+    store_pages(storage_context, llama_index_docs, previous)
+    delete_pages_after(storage_context, str(doc.id), len(llama_index_docs), previous)
+    return llama_index_docs, hashes
+
+
+def stream_document(
+    storage_context: StorageContext,
+    doc: schema.Document,
+    page_iterator: Callable[..., Iterator[LlamaIndexDocument]] = iter_pdf,
+    content: Optional[bytes] = None,
+    previous: Optional[schema.DocumentContentHashes] = None,
+) -> schema.DocumentContentHashes:
+    """
+    Indexes a document a window of pages at a time: each window's pages are stored, chunked,
+    embedded and written before the next is read (see `ingestion.streaming`). Nodes `previous`
+    already has are not embedded again. The index is only registered once the whole document is
+    written, so an interrupted document is indexed again on resume.
+    """
+    doc_id = str(doc.id)
+    previous_chunks = set(previous.chunks) if previous is not None else set()
+
+    def index_window(pages: List[LlamaIndexDocument], nodes: List[BaseNode]) -> None:
+        store_pages(storage_context, pages, previous)
+        new_nodes = [node for node in nodes if node.node_id not in previous_chunks]
+        embed_nodes(new_nodes)
+        write_nodes(storage_context, new_nodes)
+
+    pages = page_iterator(doc, content=content) if content is not None else page_iterator(doc)
+    streamed = stream_document_pages(doc_id, pages, index_window)
+    delete_pages_after(storage_context, doc_id, streamed.pages, previous)
+    write_indices(storage_context, {doc_id: []}, sorted(previous_chunks - set(streamed.chunks)))
+    return schema.DocumentContentHashes(
+        text_sha256=streamed.text_sha256, pages=streamed.pages, chunks=streamed.chunks, **hash_source(doc, content)
+    )
+
+
+def chunk_documents(doc_id: str, llama_index_docs: List[LlamaIndexDocument]) -> List[BaseNode]:
+    """Splits a document's pages into nodes with llama-index's default transformations, in page order."""
+    nodes = get_document_parser().chunk(llama_index_docs)
+    assign_chunk_ids(doc_id, nodes)
+    return nodes
+
+
+def embed_nodes(nodes: List[BaseNode]) -> None:
+    """Embeds nodes of any number of documents in shared batches, reusing cached embeddings."""
+    get_batch_embedder().embed_nodes(nodes)
+
+
+def write_nodes(storage_context: StorageContext, nodes: List[BaseNode]) -> None:
+    for i in range(0, len(nodes), constants.VECTOR_STORE_WRITE_BATCH_SIZE):
+        try:
+            storage_context.vector_store.add(nodes[i:i + constants.VECTOR_STORE_WRITE_BATCH_SIZE])
+        except BulkWriteError as e:
+            # Node ids are content-addressed, so a node an interrupted run already wrote is the same node
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+
+def write_indices(
+    storage_context: StorageContext,
+    doc_id_to_nodes: Dict[str, List[BaseNode]],
+    stale_node_ids: Optional[List[str]] = None,
+) -> Dict[str, VectorStoreIndex]:
+    """
+    Writes embedded nodes to the vector store in bulk, deletes `stale_node_ids` from it and
+    registers an index for every document that has none yet.
+    """
+    write_nodes(storage_context, [node for doc_nodes in doc_id_to_nodes.values() for node in doc_nodes])
+    if stale_node_ids:
+        # The vector store keeps node ids in `_id`
+        vectors = storage_context.vector_store.client[constants.DB_NAME][constants.VECTOR_COLLECTION_NAME]
+        vectors.delete_many({"_id": {"$in": stale_node_ids}})
+        logger.info(f"Deleted {len(stale_node_ids)} stale nodes")
+
+    doc_id_to_index = {}
+    for doc_id in doc_id_to_nodes:
+        if index_is_stored(storage_context, doc_id):
+            continue
+        # The vector store keeps the node text, so the index structs themselves stay empty
+        index = VectorStoreIndex(nodes=[], storage_context=storage_context, embed_model=LLM.embedding_model)
+        index.set_index_id(doc_id)
+        doc_id_to_index[doc_id] = index
+    return doc_id_to_index
+
+
+async def record_content_hashes(collection, doc_id_to_hashes: Dict[ObjectId, schema.DocumentContentHashes]) -> None:
+    """Stores what each document's index was built from, for the next ingestion to compare against."""
+    if not doc_id_to_hashes:
+        return
+    hashes_field = f"metadata_map.{schema.DocumentMetadataKeysEnum.CONTENT_HASHES.value}"
+    await collection.bulk_write(
+        [UpdateOne({"_id": doc_id}, {"$set": {hashes_field: hashes.model_dump()}}) for doc_id, hashes in doc_id_to_hashes.items()],
+        ordered=False,
+    )
+
+
+def build_doc_id_to_index_map(
+    documents: List[schema.Document],
+    document_loader: Callable[..., List[LlamaIndexDocument]] = load_pdf,
+    contents: Optional[Dict[str, Optional[bytes]]] = None,
+) -> Dict[str, VectorStoreIndex]:
+    """
+    Builds a mapping of document IDs to index objects.
+    Documents without an index are loaded with `document_loader` (passing their prefetched bytes from
+    `contents`, keyed by document ID, when given) and indexed. The nodes of all documents are embedded
+    in shared batches, reusing cached embeddings of chunks seen before, and written to the vector
+    store in bulk.
+    """
+    storage_context = get_storage_context()
+    contents = contents or {}
+
+    index_ids = [str(doc.id) for doc in documents]
+    stored_ids = [index_id for index_id in index_ids if index_is_stored(storage_context, index_id)]
+    doc_id_to_index = {}
+    if stored_ids:
+        doc_id_to_index.update(zip(stored_ids, load_indices_from_storage(storage_context, index_ids=stored_ids)))
 
+    # Only documents without a stored index are built, so indexed ones never get their vectors twice
+    doc_id_to_nodes = {}
+    for doc in documents:
+        if str(doc.id) not in doc_id_to_index:
+            llama_index_docs = load_document(doc, document_loader, contents.get(str(doc.id)))
+            store_pages(storage_context, llama_index_docs)
+            doc_id_to_nodes[str(doc.id)] = chunk_documents(str(doc.id), llama_index_docs)
+    if doc_id_to_nodes:
+        embed_nodes([node for nodes in doc_id_to_nodes.values() for node in nodes])
+        doc_id_to_index.update(write_indices(storage_context, doc_id_to_nodes))
     return doc_id_to_index
 
 
@@ -1,35 +1,28 @@
-# from db.session import mongodb
-from typing import AsyncGenerator, Tuple
+from typing import AsyncIterator, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.client_session import ClientSession
-from core.config import settings
-from constants import DB_NAME
-import logging
-import nest_asyncio
+from db.session import get_mongodb, close_mongodb
 
-logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
-import nest_asyncio
-nest_asyncio.apply()
+# The client and its pool belong to `db.session`; each server worker process creates its own on
+# startup (see `server.lifespan`) rather than at import
+def get_mongo_client() -> AsyncIOMotorClient:
+    return get_mongodb().client
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    return get_mongodb().database
+
+
+def close_mongo_client() -> None:
+    close_mongodb()
 
-client = AsyncIOMotorClient(settings.MONGODB_URI)
-db = client[DB_NAME]
 
 @asynccontextmanager
-async def get_db() -> Tuple[AsyncIOMotorDatabase, object]:
-# -> AsyncGenerator[Tuple[AsyncIOMotorDatabase, object], None]:
-    session =  await client.start_session()
-    # try:
-    logging.info("Starting Session ......................")
-    yield db, session
-    # finally:
-    #     logging.info("Ending Session.........................")
-    #     await session.end_session()
-
-if __name__ == "__main__":
-    import asyncio
-    asyncio.run(get_db)
+async def get_db() -> AsyncIterator[Tuple[AsyncIOMotorDatabase, object]]:
+    """The database with a session that is ended when the `async with` block exits."""
+    mongodb = get_mongodb()
+    async with mongodb.session() as session:
+        yield mongodb.database, session
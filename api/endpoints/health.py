@@ -1,6 +1,10 @@
 from typing import Dict
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from api.lifecycle import readiness
+from db.session import get_mongodb
 # from app.api import deps
 
 router = APIRouter()
@@ -12,4 +16,22 @@ async def health() -> Dict[str, str]:
     Health check endpoint.
     """
     # await db.execute(text("SELECT 1"))
-    return {"status": "alive"}
\ No newline at end of file
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready() -> JSONResponse:
+    """
+    Readiness check endpoint: 503 until the server has warmed up.
+    """
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["status"] == "ready" else 503)
+
+
+@router.get("/mongo-pool")
+async def mongo_pool_stats() -> Dict[str, float]:
+    """
+    Connections of this worker's Mongo pool: open, checked out, checkout waits and failures, and
+    sessions not yet ended.
+    """
+    return get_mongodb().metrics.stats()
@@ -1,13 +1,15 @@
-from typing import Dict, List, Tuple
-from fastapi import APIRouter, Depends
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException
 from pydantic import BaseModel
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from api.deps import get_db
 from sse_starlette.sse import EventSourceResponse
 import constants
+import schema
 from logger import logger
-import download_sec_docs
-from api.crud import async_upsert_documents_from_filings
+from api.crud import async_sec_download, async_upsert_documents_from_filings
+from ingestion.embedding_cache import get_embedding_cache
+from api.jobs import get_job_store, stream_job_events
 from pymongo import ASCENDING
 
 router = APIRouter()
@@ -16,21 +18,68 @@ router = APIRouter()
 # Define the Pydantic model for the request body
 class IngestionPayload(BaseModel):
     tickers: List[str]  # A list of strings
+    # pdf renders the html filings to pdf and parses those, html extracts the text from the html directly
+    source: schema.DocumentSourceEnum = schema.DocumentSourceEnum.PDF
 
 @router.post("/")
 async def ingestion(
     payload: IngestionPayload, 
     db_session: Tuple[AsyncIOMotorDatabase, object] = Depends(get_db)):
     tickers = payload.tickers
+    source = payload.source
 
     async def event_publisher():
         async with db_session as (db, session):
             
-            download_sec_docs.sec_download(ciks = tickers)
+            async for event in async_sec_download(
+                ciks = tickers,
+                convert_to_pdf = source == schema.DocumentSourceEnum.PDF,
+                upload_html = source == schema.DocumentSourceEnum.HTML,
+            ):
+                yield event
 
             collection = db.get_collection(constants.COLLECTION_NAME)
             await collection.create_index([("url", ASCENDING)], unique=True)
-            async for event in async_upsert_documents_from_filings(tickers, collection):
+            async for event in async_upsert_documents_from_filings(tickers, collection, source):
                 yield event
 
     return EventSourceResponse(event_publisher())
+
+
+@router.get("/embedding-cache")
+async def embedding_cache_stats() -> Dict[str, float]:
+    """
+    Hit rate of the embedding cache since the server started.
+    """
+    return get_embedding_cache().stats()
+
+
+@router.post("/jobs")
+async def create_ingestion_job(payload: IngestionPayload) -> Dict[str, str]:
+    """
+    Queues an ingestion that runs in the background, independent of any client connection.
+    """
+    job = await get_job_store().create(payload.tickers, payload.source)
+    logger.info(f"Queued ingestion job {job.id} for {payload.tickers}")
+    return {"job_id": job.id}
+
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str) -> schema.IngestionJob:
+    job = await get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def ingestion_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Streams the job's progress events as SSE, from the start or after the `Last-Event-ID` a
+    reconnecting client sends, until the job has finished.
+    """
+    store = get_job_store()
+    if await store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return EventSourceResponse(stream_job_events(store, job_id, after))
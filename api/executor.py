@@ -0,0 +1,91 @@
+"""
+Process-wide executor for the blocking parts of ingestion.
+
+Loading documents, embedding them and writing through llama-index's synchronous Mongo stores can
+take minutes for a large backfill. Running that on the event loop stalls every other request,
+including `/api/health`, so it runs on a small thread pool instead. At most `max_workers` tasks run
+and `max_queued` more wait; further submitters wait asynchronously for a slot rather than piling
+work up in the pool's unbounded queue.
+"""
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+import constants
+from logger import logger
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    def __init__(
+        self,
+        max_workers: int = constants.INGESTION_EXECUTOR_WORKERS,
+        max_queued: int = constants.INGESTION_EXECUTOR_MAX_QUEUED,
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        # asyncio semaphores belong to one event loop, so each loop submitting work gets its own
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+
+    def _loop_slots(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        with self._lock:
+            slots = self._slots.get(loop)
+            if slots is None:
+                slots = self._slots[loop] = asyncio.Semaphore(self.max_workers + self.max_queued)
+            return slots
+
+    def _call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._submitted -= 1
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Runs `fn(*args, **kwargs)` on the pool, waiting for a free slot first if the queue is full."""
+        loop = asyncio.get_running_loop()
+        async with self._loop_slots(loop):
+            with self._lock:
+                self._submitted += 1
+            return await loop.run_in_executor(self._executor, functools.partial(self._call, fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"running": self._running, "queued": self._submitted - self._running}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_executor: Optional[BoundedExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_ingestion_executor() -> BoundedExecutor:
+    """Returns the shared `BoundedExecutor`, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor()
+        return _executor
+
+
+def shutdown_ingestion_executor() -> None:
+    """Waits for running ingestion tasks and drops queued ones; the next `get_ingestion_executor` starts a fresh pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            logger.info("Shutting down the ingestion executor")
+            _executor.shutdown()
+            _executor = None
@@ -0,0 +1,410 @@
+"""
+Background ingestion jobs.
+
+`POST /api/ingestion` only runs while its SSE connection stays open. Jobs decouple the two: a job
+is queued in a `JobStore`, a `JobWorkerPool` in the server runs it, and clients follow its
+progress through the stored events. Workers hold a lease on the job they run and renew it while
+they work; when a worker dies the lease runs out and another worker picks the job up, skipping the
+filings the earlier attempt already stored and indexed.
+
+`MongoJobStore` keeps jobs in MongoDB so any server process can run or report on them.
+`InMemoryJobStore` is a stand-in for a single process, such as local runs and tests.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+import constants
+import schema
+from api.crud import async_sec_download, async_upsert_documents_from_filings
+from logger import logger
+
+Event = Dict[str, str]
+TERMINAL_STATUSES = {schema.IngestionJobStatusEnum.SUCCEEDED, schema.IngestionJobStatusEnum.FAILED}
+
+
+class JobStore(ABC):
+    @abstractmethod
+    async def create(self, tickers: List[str], source: schema.DocumentSourceEnum) -> schema.IngestionJob:
+        """Queues a new job."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[schema.IngestionJob]:
+        ...
+
+    @abstractmethod
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[schema.IngestionJob]:
+        """Leases the oldest queued job, or a running one whose lease ran out, to `worker_id`."""
+
+    @abstractmethod
+    async def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extends the lease of a job `worker_id` holds; False if it no longer holds it."""
+
+    @abstractmethod
+    async def add_event(self, job_id: str, event: Event) -> int:
+        """Stores a progress event and returns its sequence number, counting from 1."""
+
+    @abstractmethod
+    async def events(self, job_id: str, after: int = 0) -> List[Event]:
+        """Returns the events numbered after `after`, each with its number as `id`."""
+
+    @abstractmethod
+    async def complete_filings(self, job_id: str, urls: List[str]) -> None:
+        """Records documents as stored and indexed."""
+
+    @abstractmethod
+    async def finish(
+        self, job_id: str, worker_id: str, status: schema.IngestionJobStatusEnum, error: Optional[str] = None
+    ) -> None:
+        """Releases the job's lease, leaving it with `status`."""
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: Dict[str, schema.IngestionJob] = {}
+        self._events: Dict[str, List[Event]] = {}
+
+    async def create(self, tickers: List[str], source: schema.DocumentSourceEnum) -> schema.IngestionJob:
+        job = schema.IngestionJob(id=uuid.uuid4().hex, tickers=tickers, source=source)
+        self._jobs[job.id] = job
+        self._events[job.id] = []
+        return job.model_copy(deep=True)
+
+    async def get(self, job_id: str) -> Optional[schema.IngestionJob]:
+        job = self._jobs.get(job_id)
+        return job.model_copy(deep=True) if job else None
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[schema.IngestionJob]:
+        now = datetime.utcnow()
+        for job in sorted(self._jobs.values(), key=lambda job: job.created_at):
+            if job.status == schema.IngestionJobStatusEnum.QUEUED or (
+                job.status == schema.IngestionJobStatusEnum.RUNNING and job.lease_expires_at < now
+            ):
+                job.status = schema.IngestionJobStatusEnum.RUNNING
+                job.worker_id = worker_id
+                job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+                job.attempts += 1
+                job.updated_at = now
+                return job.model_copy(deep=True)
+        return None
+
+    async def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        job = self._jobs[job_id]
+        if job.worker_id != worker_id or job.status != schema.IngestionJobStatusEnum.RUNNING:
+            return False
+        job.lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        return True
+
+    async def add_event(self, job_id: str, event: Event) -> int:
+        job = self._jobs[job_id]
+        job.event_count += 1
+        self._events[job_id].append({**event, "id": str(job.event_count)})
+        return job.event_count
+
+    async def events(self, job_id: str, after: int = 0) -> List[Event]:
+        return self._events.get(job_id, [])[after:]
+
+    async def complete_filings(self, job_id: str, urls: List[str]) -> None:
+        job = self._jobs[job_id]
+        job.completed_filings.extend(url for url in urls if url not in job.completed_filings)
+
+    async def finish(
+        self, job_id: str, worker_id: str, status: schema.IngestionJobStatusEnum, error: Optional[str] = None
+    ) -> None:
+        job = self._jobs[job_id]
+        if job.worker_id != worker_id:
+            return
+        job.status = status
+        job.error = error
+        job.worker_id = None
+        job.lease_expires_at = None
+        job.updated_at = datetime.utcnow()
+
+
+class MongoJobStore(JobStore):
+    def __init__(self, db):
+        self.jobs = db.get_collection(constants.INGESTION_JOBS_COLLECTION_NAME)
+        self.job_events = db.get_collection(constants.INGESTION_JOB_EVENTS_COLLECTION_NAME)
+        self._indexes_created = False
+
+    async def _ensure_indexes(self) -> None:
+        if not self._indexes_created:
+            await self.jobs.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+            await self.job_events.create_index([("job_id", ASCENDING), ("seq", ASCENDING)], unique=True)
+            self._indexes_created = True
+
+    @staticmethod
+    def _to_job(document: Optional[dict]) -> Optional[schema.IngestionJob]:
+        if document is None:
+            return None
+        return schema.IngestionJob(id=document.pop("_id"), **document)
+
+    async def create(self, tickers: List[str], source: schema.DocumentSourceEnum) -> schema.IngestionJob:
+        await self._ensure_indexes()
+        job = schema.IngestionJob(id=uuid.uuid4().hex, tickers=tickers, source=source)
+        document = job.model_dump(mode="json", exclude={"id"})
+        document.update(_id=job.id, created_at=job.created_at, updated_at=job.updated_at)
+        await self.jobs.insert_one(document)
+        return job
+
+    async def get(self, job_id: str) -> Optional[schema.IngestionJob]:
+        return self._to_job(await self.jobs.find_one({"_id": job_id}))
+
+    async def claim(self, worker_id: str, lease_seconds: float) -> Optional[schema.IngestionJob]:
+        await self._ensure_indexes()
+        now = datetime.utcnow()
+        document = await self.jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": schema.IngestionJobStatusEnum.QUEUED.value},
+                    {"status": schema.IngestionJobStatusEnum.RUNNING.value, "lease_expires_at": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": schema.IngestionJobStatusEnum.RUNNING.value,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._to_job(document)
+
+    async def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        result = await self.jobs.update_one(
+            {"_id": job_id, "worker_id": worker_id, "status": schema.IngestionJobStatusEnum.RUNNING.value},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}},
+        )
+        return result.matched_count == 1
+
+    async def add_event(self, job_id: str, event: Event) -> int:
+        job = await self.jobs.find_one_and_update(
+            {"_id": job_id},
+            {"$inc": {"event_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"event_count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        seq = job["event_count"]
+        await self.job_events.insert_one({"job_id": job_id, "seq": seq, **event})
+        return seq
+
+    async def events(self, job_id: str, after: int = 0) -> List[Event]:
+        cursor = self.job_events.find({"job_id": job_id, "seq": {"$gt": after}}).sort("seq", ASCENDING)
+        return [
+            {"event": document["event"], "data": document["data"], "id": str(document["seq"])}
+            async for document in cursor
+        ]
+
+    async def complete_filings(self, job_id: str, urls: List[str]) -> None:
+        await self.jobs.update_one({"_id": job_id}, {"$addToSet": {"completed_filings": {"$each": urls}}})
+
+    async def finish(
+        self, job_id: str, worker_id: str, status: schema.IngestionJobStatusEnum, error: Optional[str] = None
+    ) -> None:
+        await self.jobs.update_one(
+            {"_id": job_id, "worker_id": worker_id},
+            {
+                "$set": {
+                    "status": status.value,
+                    "error": error,
+                    "worker_id": None,
+                    "lease_expires_at": None,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+
+
+async def run_ingestion_job(job: schema.IngestionJob, store: JobStore) -> AsyncIterator[Event]:
+    """
+    Downloads the job's filings, then stores and indexes their documents, recording each indexed
+    document on the job so a later attempt can skip it.
+    """
+    # Imported here so the job store itself does not open the API's database client
+    from api.deps import get_database
+
+    completed = set(job.completed_filings)
+    if completed:
+        yield {"event": "resume", "data": f"Resuming after {len(completed)} completed filings (attempt {job.attempts})."}
+
+    async for event in async_sec_download(
+        ciks=job.tickers,
+        convert_to_pdf=job.source == schema.DocumentSourceEnum.PDF,
+        upload_html=job.source == schema.DocumentSourceEnum.HTML,
+    ):
+        yield event
+
+    collection = get_database().get_collection(constants.COLLECTION_NAME)
+    await collection.create_index([("url", ASCENDING)], unique=True)
+
+    async def on_indexed(documents: List[schema.Document]) -> None:
+        await store.complete_filings(job.id, [doc.url for doc in documents])
+
+    async for event in async_upsert_documents_from_filings(
+        job.tickers, collection, job.source, completed=completed, on_indexed=on_indexed
+    ):
+        yield event
+
+
+class JobWorkerPool:
+    """
+    Runs queued jobs on `workers` asyncio tasks. The blocking parts of a job already run on the
+    ingestion executor, so the tasks themselves only wait.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run_job: Callable[[schema.IngestionJob, JobStore], AsyncIterator[Event]] = run_ingestion_job,
+        workers: int = constants.INGESTION_JOB_WORKERS,
+        max_attempts: int = constants.INGESTION_JOB_MAX_ATTEMPTS,
+        lease_seconds: float = constants.INGESTION_JOB_LEASE_SECONDS,
+        poll_seconds: float = constants.INGESTION_JOB_POLL_SECONDS,
+    ):
+        self.store = store
+        self.run_job = run_job
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks = [asyncio.create_task(self._work(f"{prefix}-{i}")) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, worker_id: str) -> None:
+        while True:
+            try:
+                job = await self.store.claim(worker_id, self.lease_seconds)
+            except Exception:
+                logger.exception(f"Worker {worker_id} failed to claim an ingestion job")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            await self._run(job, worker_id)
+
+    async def _keep_lease(self, job_id: str, worker_id: str) -> None:
+        """Renews the job's lease until another worker may have claimed it, then returns."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await self.store.renew(job_id, worker_id, self.lease_seconds)
+            except Exception:
+                # Tried again on the next round, before the lease runs out
+                logger.exception(f"Worker {worker_id} failed to renew the lease on ingestion job {job_id}")
+                continue
+            if not renewed:
+                logger.warning(f"Worker {worker_id} lost the lease on ingestion job {job_id}")
+                return
+
+    async def _consume(self, job: schema.IngestionJob) -> None:
+        async for event in self.run_job(job, self.store):
+            await self.store.add_event(job.id, event)
+
+    async def _run(self, job: schema.IngestionJob, worker_id: str) -> None:
+        if job.attempts > self.max_attempts:
+            await self.store.finish(
+                job.id, worker_id, schema.IngestionJobStatusEnum.FAILED, f"Gave up after {self.max_attempts} attempts"
+            )
+            return
+
+        logger.info(f"Worker {worker_id} running ingestion job {job.id} (attempt {job.attempts})")
+        lease = asyncio.create_task(self._keep_lease(job.id, worker_id))
+        consume = asyncio.create_task(self._consume(job))
+        try:
+            await asyncio.wait([consume, lease], return_when=asyncio.FIRST_COMPLETED)
+            if not consume.done():
+                # Another worker may already be running the job: stop instead of ingesting it twice,
+                # and leave its events and status to the worker that holds the lease now
+                consume.cancel()
+                await asyncio.gather(consume, return_exceptions=True)
+                logger.warning(f"Worker {worker_id} stopped ingestion job {job.id} after losing its lease")
+                return
+            consume.result()
+            await self.store.add_event(job.id, {"event": "job_done", "data": f"Job {job.id} succeeded."})
+            await self.store.finish(job.id, worker_id, schema.IngestionJobStatusEnum.SUCCEEDED)
+        except asyncio.CancelledError:
+            # The server is stopping; hand the job back so it resumes on the next worker
+            consume.cancel()
+            await asyncio.gather(consume, return_exceptions=True)
+            await self.store.finish(job.id, worker_id, schema.IngestionJobStatusEnum.QUEUED)
+            raise
+        except Exception as e:
+            logger.exception(f"Ingestion job {job.id} failed")
+            error = f"{type(e).__name__}: {e}"
+            retry = job.attempts < self.max_attempts
+            await self.store.add_event(
+                job.id, {"event": "error", "data": f"{error}{' Retrying.' if retry else ''}"}
+            )
+            status = schema.IngestionJobStatusEnum.QUEUED if retry else schema.IngestionJobStatusEnum.FAILED
+            await self.store.finish(job.id, worker_id, status, error)
+        finally:
+            lease.cancel()
+            await asyncio.gather(lease, return_exceptions=True)
+
+
+async def stream_job_events(store: JobStore, job_id: str, after: int = 0, poll_seconds: float = 0.5):
+    """
+    Yields the job's events numbered after `after` as they are stored, until the job has finished.
+    """
+    while True:
+        job = await store.get(job_id)
+        for event in await store.events(job_id, after):
+            after = int(event["id"])
+            yield event
+        if job is None or job.status in TERMINAL_STATUSES:
+            # Read after the status, so no event stored before the job finished is missed
+            for event in await store.events(job_id, after):
+                yield event
+            return
+        await asyncio.sleep(poll_seconds)
+
+
+_store: Optional[JobStore] = None
+_pool: Optional[JobWorkerPool] = None
+
+
+def get_job_store() -> JobStore:
+    """Returns the job store configured by `INGESTION_JOB_STORE`, created on first use."""
+    global _store
+    if _store is None:
+        kind = os.environ.get("INGESTION_JOB_STORE", constants.INGESTION_JOB_STORE)
+        if kind == "memory":
+            _store = InMemoryJobStore()
+        else:
+            from api.deps import get_database
+
+            _store = MongoJobStore(get_database())
+    return _store
+
+
+def start_job_workers() -> None:
+    global _pool
+    if _pool is None:
+        _pool = JobWorkerPool(get_job_store())
+        _pool.start()
+
+
+async def stop_job_workers() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
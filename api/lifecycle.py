@@ -0,0 +1,73 @@
+"""
+Server readiness.
+
+Heavy dependencies and clients are loaded on first use, so the server starts accepting requests
+(and answers liveness checks) right away. Warm-up then loads what ingestion needs in the
+background: the symbol index, the embedding client, the node parser, the embedding cache and the
+storage context. Readiness checks report ready once it is done, so a load balancer only routes
+work to a process that will not stall its first request on imports and connection setup.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+from api.executor import get_ingestion_executor
+from logger import logger
+
+_warm_up_task: Optional[asyncio.Task] = None
+_ready = False
+_error: Optional[str] = None
+_warm_up_seconds: Optional[float] = None
+
+
+def warm_up() -> None:
+    from api.storage import get_storage_context
+    from ingestion.embedding_cache import get_embedding_cache
+    from ingestion.symbol_index import get_symbol_index
+    from llm import LLM
+
+    get_symbol_index()
+    LLM.warm_up()
+    get_embedding_cache()
+    get_storage_context()
+
+
+async def _run_warm_up() -> None:
+    global _ready, _error, _warm_up_seconds
+    start = time.perf_counter()
+    try:
+        await get_ingestion_executor().run(warm_up)
+    except Exception as e:
+        _error = f"{type(e).__name__}: {e}"
+        logger.exception("Warm-up failed")
+        return
+    _warm_up_seconds = time.perf_counter() - start
+    _ready = True
+    logger.info(f"Warm-up finished in {_warm_up_seconds:.2f}s")
+
+
+def start_warm_up() -> None:
+    global _warm_up_task
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.get_running_loop().create_task(_run_warm_up())
+
+
+async def stop_warm_up() -> None:
+    global _warm_up_task, _ready, _error, _warm_up_seconds
+    if _warm_up_task is not None:
+        _warm_up_task.cancel()
+        await asyncio.gather(_warm_up_task, return_exceptions=True)
+    _warm_up_task = None
+    _ready, _error, _warm_up_seconds = False, None, None
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def readiness() -> Dict:
+    if _ready:
+        return {"status": "ready", "warm_up_seconds": round(_warm_up_seconds, 2)}
+    if _error is not None:
+        return {"status": "failed", "error": _error}
+    return {"status": "warming_up"}
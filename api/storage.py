@@ -0,0 +1,57 @@
+"""
+Process-wide llama-index storage for the vector index.
+
+The docstore, index store and vector store are created once and share the process's Mongo pool
+(see `db.session`) through its thread-safe `MongoClient`, so ingestion tasks running on worker
+threads neither open new connections for every upserted document nor a second pool.
+"""
+import threading
+from typing import Optional
+
+from llama_index.core import StorageContext
+
+import constants
+from db.session import get_mongodb
+from logger import logger
+
+_storage_context: Optional[StorageContext] = None
+_lock = threading.Lock()
+
+
+def get_storage_context() -> StorageContext:
+    """Returns the shared `StorageContext`, creating it on first use."""
+    global _storage_context
+    with _lock:
+        if _storage_context is None:
+            # Imported here so that only processes that index pay for loading the Mongo integrations
+            from llama_index.storage.kvstore.mongodb import MongoDBKVStore
+            from llama_index.storage.index_store.mongodb import MongoIndexStore
+            from llama_index.storage.docstore.mongodb import MongoDocumentStore
+            from llama_index.vector_stores.mongodb import MongoDBAtlasVectorSearch
+
+            logger.info("Creating the shared storage context")
+            mongo_client = get_mongodb().sync_client
+            kvstore = MongoDBKVStore(mongo_client=mongo_client, db_name=constants.DB_NAME)
+            _storage_context = StorageContext.from_defaults(
+                docstore=MongoDocumentStore(kvstore, namespace=constants.DOCSTORE_NAMESPACE),
+                index_store=MongoIndexStore(kvstore, namespace=constants.INDEX_NAMESPACE),
+                vector_store=MongoDBAtlasVectorSearch(
+                    mongodb_client=mongo_client,
+                    db_name=constants.DB_NAME,
+                    collection_name=constants.VECTOR_COLLECTION_NAME,
+                    vector_index_name=constants.VECTOR_INDEX_NAME,
+                    relevance_score_fn="cosine",
+                    # Unordered, so one node already written does not stop the rest of a batch
+                    insert_kwargs={"ordered": False},
+                ),
+            )
+        return _storage_context
+
+
+def close_storage_context() -> None:
+    """Drops the shared storage context; the pool it used is closed with `db.session.close_mongodb`."""
+    global _storage_context
+    with _lock:
+        if _storage_context is not None:
+            logger.info("Closing the shared storage context")
+        _storage_context = None
@@ -0,0 +1,88 @@
+"""
+Fetches pdfs from a local HTTP server, comparing a fresh `requests.get` per document (the old
+`load_pdf` behaviour) with the shared, pooled `DocumentFetcher`, and checks the fetched bytes parse
+from memory.
+
+Usage: python -m benchmarks.bench_document_fetch [--documents 200] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from pypdf import PdfWriter
+
+from ingestion.fetcher import DocumentFetcher
+from ingestion.file_utils import _load_pdf_stream
+
+
+def make_pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(612, 792)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def serve(body: bytes, latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def fetch_pooled(urls, concurrency: int) -> float:
+    fetcher = DocumentFetcher(max_concurrency=concurrency)
+    start = time.perf_counter()
+    contents = await asyncio.gather(*(fetcher.fetch(url) for url in urls))
+    seconds = time.perf_counter() - start
+    await fetcher.aclose()
+    assert len(_load_pdf_stream(io.BytesIO(contents[0]), "bench.pdf", {})) > 0
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server = serve(make_pdf(args.pages), args.latency)
+    urls = [f"http://127.0.0.1:{server.server_address[1]}/doc-{i}.pdf" for i in range(args.documents)]
+
+    start = time.perf_counter()
+    for url in urls:
+        with requests.get(url, stream=True) as r:
+            r.raise_for_status()
+            b"".join(r.iter_content(chunk_size=8192))
+    serial = time.perf_counter() - start
+    pooled = asyncio.run(fetch_pooled(urls, args.concurrency))
+
+    print(f"{args.documents} documents, {args.latency * 1000:.0f} ms server latency")
+    print(f"requests.get per document : {serial:6.2f}s ({args.documents / serial:7.1f} docs/s)")
+    print(f"pooled async fetcher      : {pooled:6.2f}s ({args.documents / pooled:7.1f} docs/s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
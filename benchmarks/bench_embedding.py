@@ -0,0 +1,100 @@
+"""
+Embeds the nodes of many small documents against a local OpenAI-compatible embeddings stub,
+comparing one embedding pass per document (what `VectorStoreIndex.from_documents` did for every
+filing) with `BatchEmbedder` batching nodes across documents and sending batches concurrently.
+
+Usage: python -m benchmarks.bench_embedding [--documents 40] [--nodes-per-document 12] [--latency 0.15]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llama_index.core.schema import MetadataMode, TextNode
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from ingestion.embedding import BatchEmbedder
+
+DIMENSIONS = 64
+WORDS = "revenue income margin liquidity segment guidance risk capital dividend cash operating".split()
+
+
+def serve(latency: float, per_input_latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        requests = 0
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = payload["input"]
+            Handler.requests += 1
+            time.sleep(latency + per_input_latency * len(inputs))
+            body = json.dumps({
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": [0.1] * DIMENSIONS}
+                    for i in range(len(inputs))
+                ],
+                "model": payload["model"],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.handler = Handler
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_documents(documents: int, nodes_per_document: int):
+    rng = random.Random(0)
+    return [
+        [TextNode(text=" ".join(rng.choices(WORDS, k=350))) for _ in range(nodes_per_document)]
+        for _ in range(documents)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--nodes-per-document", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--per-input-latency", type=float, default=0.001)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    server = serve(args.latency, args.per_input_latency)
+    embed_model = OpenAIEmbedding(api_base=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="bench")
+    total = args.documents * args.nodes_per_document
+
+    start = time.perf_counter()
+    for nodes in make_documents(args.documents, args.nodes_per_document):
+        embed_model.get_text_embedding_batch([node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes])
+    per_document = time.perf_counter() - start
+    per_document_requests = server.handler.requests
+
+    server.handler.requests = 0
+    nodes = [node for doc_nodes in make_documents(args.documents, args.nodes_per_document) for node in doc_nodes]
+    start = time.perf_counter()
+    BatchEmbedder(embed_model, max_concurrency=args.concurrency).embed_nodes(nodes)
+    batched = time.perf_counter() - start
+    assert all(node.embedding is not None for node in nodes)
+
+    print(f"{args.documents} documents x {args.nodes_per_document} nodes, {args.latency * 1000:.0f} ms request latency")
+    print(f"per document       : {per_document:6.2f}s ({total / per_document:7.1f} nodes/s, {per_document_requests} requests)")
+    print(f"batched, concurrent: {batched:6.2f}s ({total / batched:7.1f} nodes/s, {server.handler.requests} requests)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
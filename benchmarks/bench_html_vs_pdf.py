@@ -0,0 +1,86 @@
+"""
+Compares the throughput of building llama-index documents straight from a filing's html with the
+pdf path (wkhtmltopdf rendering followed by `PDFReader`), on synthetic filings.
+
+The pdf side needs wkhtmltopdf on the PATH and is skipped without it.
+
+Usage: python -m benchmarks.bench_html_vs_pdf [--pages 100] [--files 3]
+"""
+import argparse
+import shutil
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pdfkit
+from llama_index.readers.file import PDFReader
+
+from ingestion.html_utils import iter_html_pages
+
+PAGE = """<div style="page-break-before:always">
+<p style="font-family:Times New Roman">Item {page}. Management's Discussion and Analysis of Financial Condition.
+Net sales increased during the period primarily due to higher sales of products and services.</p>
+<table>{rows}</table>
+<p>{paragraph}</p>
+</div>
+"""
+ROW = "<tr><td>Line item {i}</td><td>$</td><td>{value:,}</td><td>{value2:,}</td></tr>"
+
+
+def write_filing(path: Path, pages: int) -> None:
+    with open(path, "w") as f:
+        f.write('<html><head><style>td {padding: 2px}</style></head><body>')
+        f.write('<div style="display:none"><ix:header>hidden inline XBRL</ix:header></div>')
+        for page in range(pages):
+            rows = "".join(ROW.format(i=i, value=i * 1234, value2=i * 987) for i in range(20))
+            f.write(PAGE.format(page=page, rows=rows, paragraph="Lorem ipsum dolor sit amet. " * 40))
+        f.write("</body></html>")
+
+
+def html_path(paths) -> int:
+    pages = 0
+    for path in paths:
+        with open(path, "rb") as stream:
+            pages += sum(1 for _ in iter_html_pages(stream))
+    return pages
+
+
+def pdf_path(paths) -> int:
+    pages = 0
+    for path in paths:
+        pdf = path.with_suffix(".pdf")
+        pdfkit.from_file(str(path), str(pdf), options={"enable-local-file-access": None, "quiet": None})
+        pages += len(PDFReader().load_data(pdf))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--files", type=int, default=3)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        paths = [Path(temp_dir) / f"primary-document-{i}.html" for i in range(args.files)]
+        for path in paths:
+            write_filing(path, args.pages)
+        size_mb = sum(path.stat().st_size for path in paths) / 1024 / 1024
+        print(f"{args.files} filings x {args.pages} pages ({size_mb:.1f} MB of html)")
+
+        runs = [("html", html_path)]
+        if shutil.which("wkhtmltopdf"):
+            runs.append(("pdf", pdf_path))
+        else:
+            print("wkhtmltopdf not found, skipping the pdf path")
+        for label, fn in runs:
+            start = time.perf_counter()
+            pages = fn(paths)
+            seconds = time.perf_counter() - start
+            print(
+                f"{label:4s}: {pages} pages in {seconds:7.2f}s | {args.files / seconds:7.2f} filings/s"
+                f" | {pages / seconds:8.1f} pages/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measures server startup in fresh interpreters: importing the server now that heavy dependencies
+and clients load on first use, importing it and running the warm-up, and importing it and building
+every LLM client as importing `llm` used to do. Then lists what each deferred dependency costs on
+top of llama_index.core, which the schema's enums still need at import time.
+
+Building the guidance model downloads its tokenizer, so the eager run fails offline; it is then
+reported without it.
+
+Usage: python -m benchmarks.bench_import_time [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ENV = {"OPENAI_API_KEY": "bench", "INGESTION_JOB_STORE": "memory"}
+
+SCENARIOS = {
+    "import server (lazy)": "import server",
+    "import server + warm-up": "import server\nfrom llm import LLM\nLLM.warm_up()",
+    "import server + all clients (eager)": (
+        "import server\nfrom llm import LLM\n"
+        "LLM.llm, LLM.chat_llm, LLM.embedding_model, LLM.node_parser, LLM.guidanceLLM"
+    ),
+    "import server + all clients but guidance (eager)": (
+        "import server\nfrom llm import LLM\nLLM.llm, LLM.chat_llm, LLM.embedding_model, LLM.node_parser"
+    ),
+}
+
+DEFERRED_MODULES = [
+    "guidance",
+    "llama_index.llms.openai",
+    "llama_index.embeddings.openai",
+    "llama_index.vector_stores.mongodb",
+    "llama_index.storage.docstore.mongodb",
+    "pandas",
+    "boto3",
+    "pytickersymbols",
+]
+
+TIMED = "import time\n_start = time.perf_counter()\n{code}\nprint(time.perf_counter() - _start)"
+
+
+def run(code: str, setup: str = "") -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", setup + TIMED.format(code=code)],
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def median_of(runs: int, code: str, setup: str = "") -> float:
+    return statistics.median(run(code, setup) for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} fresh interpreters")
+    for name, code in SCENARIOS.items():
+        try:
+            print(f"{name:50s} {median_of(args.runs, code):6.2f} s")
+        except RuntimeError as e:
+            print(f"{name:50s} failed: {e}")
+
+    print("deferred imports, after llama_index.core")
+    for module in DEFERRED_MODULES:
+        try:
+            seconds = median_of(args.runs, f"import {module}", setup="import llama_index.core\n")
+            print(f"  {module:48s} {seconds:6.2f} s")
+        except RuntimeError as e:
+            print(f"  {module:48s} failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
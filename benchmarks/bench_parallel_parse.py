@@ -0,0 +1,79 @@
+"""
+Compares sequential pdf parsing and chunking (`PDFReader` plus the node parser in one thread) with
+`DocumentParser` spreading page ranges over a process pool, on a synthetic text pdf, and checks
+both give the same pages and nodes in the same order.
+
+Usage: python -m benchmarks.bench_parallel_parse [--pages 300] [--workers 4] [--pages-per-task 25]
+"""
+import argparse
+import io
+import time
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+import constants
+from ingestion.parsing import DocumentParser, chunk_pages, extract_pdf_pages
+
+SENTENCE = "Net sales increased due to higher sales of services and the effect of foreign currency."
+
+
+def make_text_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for page_number in range(pages):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+        })
+        lines = [f"Page {page_number} line {i}. {SENTENCE}" for i in range(lines_per_page)]
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 9 Tf 11 TL 36 756 Td {text} ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-task", type=int, default=constants.PARSE_PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    pdf = make_text_pdf(args.pages)
+    extra_info = {constants.DB_DOC_ID_KEY: "bench"}
+
+    start = time.perf_counter()
+    sequential_pages = extract_pdf_pages(pdf, "bench.pdf", extra_info)
+    sequential_nodes = chunk_pages(sequential_pages)
+    sequential_s = time.perf_counter() - start
+
+    document_parser = DocumentParser(max_workers=args.workers, pages_per_task=args.pages_per_task)
+    try:
+        # Starts the worker processes, so the timing below leaves out their startup
+        document_parser.chunk(sequential_pages)
+        start = time.perf_counter()
+        pages = document_parser.load_pdf(pdf, "bench.pdf", extra_info)
+        nodes = document_parser.chunk(pages)
+        parallel_s = time.perf_counter() - start
+    finally:
+        document_parser.shutdown()
+
+    assert [page.text for page in pages] == [page.text for page in sequential_pages]
+    assert [page.metadata for page in pages] == [page.metadata for page in sequential_pages]
+    assert [node.text for node in nodes] == [node.text for node in sequential_nodes]
+    assert [node.metadata["page_label"] for node in nodes] == [node.metadata["page_label"] for node in sequential_nodes]
+
+    print(f"{args.pages} pages, {len(nodes)} nodes, {args.workers} workers, {args.pages_per_task} pages per task")
+    print(f"sequential {sequential_s:7.2f} s | process pool {parallel_s:7.2f} s | speedup {sequential_s / parallel_s:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Uploads synthetic pdfs to a local moto S3 server, comparing the old per-file boto3 client with the
+shared `S3Uploader`, then re-runs the uploader to show unchanged files being skipped.
+
+Needs `moto[server]` (not a runtime dependency).
+
+Usage: python -m benchmarks.bench_s3_upload [--files 50] [--size-mb 2]
+"""
+import argparse
+import os
+import time
+from tempfile import TemporaryDirectory
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+import constants
+from ingestion.s3_uploader import S3Uploader, s3_key_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--size-mb", type=float, default=2)
+    args = parser.parse_args()
+
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    os.environ.update(
+        S3_ENDPOINT_URL=f"http://{host}:{port}",
+        AWS_ACCESS_KEY="bench",
+        AWS_SECRET_ACCESS_KEY="bench",
+        AWS_DEFAULT_REGION="us-east-1",
+    )
+
+    with TemporaryDirectory() as temp_dir:
+        data_dir = os.path.join(temp_dir, "data")
+        os.makedirs(os.path.join(data_dir, "sec-edgar-filings"))
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(data_dir, "sec-edgar-filings", f"primary-document-{i}.pdf")
+            with open(path, "wb") as f:
+                f.write(os.urandom(int(args.size_mb * 1024 * 1024)))
+            paths.append(path)
+
+        def new_client():
+            return boto3.client(
+                's3',
+                aws_access_key_id="bench",
+                aws_secret_access_key="bench",
+                endpoint_url=os.environ["S3_ENDPOINT_URL"],
+            )
+
+        new_client().create_bucket(Bucket=constants.BUCKET_NAME)
+
+        start = time.perf_counter()
+        for path in paths:
+            new_client().upload_file(path, constants.BUCKET_NAME, f"serial/{s3_key_for(path)}")
+        serial = time.perf_counter() - start
+
+        uploader = S3Uploader(record_path=os.path.join(temp_dir, "uploads.sqlite3"))
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            results = uploader.upload_many(paths)
+            timings.append((time.perf_counter() - start, sum(r.skipped for r in results)))
+
+    print(f"{args.files} files x {args.size_mb} MB")
+    print(f"client per file, serial : {serial:6.2f}s")
+    print(f"shared uploader         : {timings[0][0]:6.2f}s")
+    print(f"shared uploader, re-run : {timings[1][0]:6.2f}s ({timings[1][1]} unchanged files skipped)")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Downloads filings for many tickers from the local EDGAR stand-in, comparing a single worker
+(the old serial behaviour) with the concurrent downloader under the same 10 requests/second limit.
+
+Usage: python -m benchmarks.bench_sec_download [--tickers 20] [--latency 0.2] [--workers 8]
+"""
+import argparse
+from tempfile import TemporaryDirectory
+
+import constants
+from benchmarks.edgar_stub import EdgarStub
+from ingestion.sec_downloader import ConcurrentDownloader, EdgarClient
+
+
+def run(stub: EdgarStub, tickers, workers: int, rate: float) -> None:
+    client = EdgarClient(www_url=stub.url, data_url=stub.url, requests_per_second=rate, pool_size=workers, backoff_seconds=0.01)
+    with TemporaryDirectory() as output_dir:
+        report = ConcurrentDownloader(output_dir, client=client, max_workers=workers).download(
+            [(ticker, form) for ticker in tickers for form in constants.DEFAULT_FILING_TYPES], limit=3
+        )
+    client.close()
+    requests = 1 + len(tickers) * len(constants.DEFAULT_FILING_TYPES) + report.downloaded_files
+    print(
+        f"workers={workers:3d}: {report.filings} filings in {report.seconds:6.2f}s "
+        f"({requests / report.seconds:5.1f} req/s, {len(report.errors)} errors)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=constants.SEC_DOWNLOAD_WORKERS)
+    parser.add_argument("--rate", type=float, default=constants.SEC_EDGAR_REQUESTS_PER_SECOND)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    stub = EdgarStub(0, tickers, latency=args.latency).start()
+    for workers in (1, args.workers):
+        run(stub, tickers, workers, args.rate)
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compares `parse_sec_header` with the legacy `parse_*_from_full_submission_txt` functions
+on large synthetic full-submission.txt files.
+
+Usage: python -m benchmarks.bench_sec_header [--size-mb 20] [--files 5] [--repeat 3]
+"""
+import argparse
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from ingestion.file_utils import (
+    parse_sec_header,
+    parse_quarter_from_full_submission_txt,
+    parse_dates_from_full_submission_txt,
+    parse_cik_from_full_submission_txt,
+    parse_ticker_symbol_from_full_submission_txt,
+)
+
+HEADER = """<SEC-DOCUMENT>0000320193-22-000070.txt : 20220729
+<SEC-HEADER>0000320193-22-000070.hdr.sgml : 20220729
+<ACCEPTANCE-DATETIME>20220728180112
+ACCESSION NUMBER:\t\t0000320193-22-000070
+CONFORMED SUBMISSION TYPE:\t10-Q
+PUBLIC DOCUMENT COUNT:\t\t80
+CONFORMED PERIOD OF REPORT:\t20220625
+FILED AS OF DATE:\t\t20220729
+DATE AS OF CHANGE:\t\t20220728
+
+FILER:
+
+\tCOMPANY DATA:\t
+\t\tCOMPANY CONFORMED NAME:\t\t\tApple Inc.
+\t\tCENTRAL INDEX KEY:\t\t\t0000320193
+\t\tSTANDARD INDUSTRIAL CLASSIFICATION:\tELECTRONIC COMPUTERS [3571]
+</SEC-HEADER>
+<DOCUMENT>
+<TYPE>10-Q
+<SEQUENCE>1
+<FILENAME>aapl-20220625.htm
+<TEXT>
+"""
+
+EXHIBIT_LINE = "<p style=\"font-family:Helvetica\">Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n"
+
+FISCAL_PERIOD_FOCUS = """<td class="pl" style="border-bottom: 0px;" valign="top"><a class="a" href="javascript:void(0);" onclick="Show.showAR( this, 'defref_dei_DocumentFiscalPeriodFocus', window );">Document Fiscal Period Focus</a></td>
+<td class="text">Q3<span></span>
+"""
+
+
+def write_submission(path: Path, size_mb: int) -> None:
+    filler = EXHIBIT_LINE * (size_mb * 1024 * 1024 // len(EXHIBIT_LINE))
+    with open(path, "w") as f:
+        f.write(HEADER)
+        # The R pages that carry the fiscal period sit after the primary document and most exhibits.
+        f.write(filler)
+        f.write(FISCAL_PERIOD_FOCUS)
+        f.write(filler[: len(filler) // 10])
+        f.write("</TEXT>\n</DOCUMENT>\n</SEC-DOCUMENT>\n")
+
+
+def legacy(path: Path, parse_quarter: bool) -> None:
+    if parse_quarter:
+        parse_quarter_from_full_submission_txt(path)
+    parse_dates_from_full_submission_txt(path)
+    parse_cik_from_full_submission_txt(path)
+    parse_ticker_symbol_from_full_submission_txt(path)
+
+
+def single_pass(path: Path, parse_quarter: bool) -> None:
+    parse_sec_header(path, parse_quarter=parse_quarter)
+
+
+def bench(fn, paths, parse_quarter: bool, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            fn(path, parse_quarter)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        paths = [Path(temp_dir) / f"full-submission-{i}.txt" for i in range(args.files)]
+        for path in paths:
+            write_submission(path, args.size_mb)
+
+        header = parse_sec_header(paths[0], parse_quarter=True)
+        assert header.quarter == parse_quarter_from_full_submission_txt(paths[0])
+        assert header.cik == parse_cik_from_full_submission_txt(paths[0])
+
+        print(f"{args.files} files x {args.size_mb} MB, best of {args.repeat}")
+        for label, parse_quarter in (("10-K", False), ("10-Q", True)):
+            legacy_s = bench(legacy, paths, parse_quarter, args.repeat)
+            single_s = bench(single_pass, paths, parse_quarter, args.repeat)
+            print(
+                f"{label}: legacy {legacy_s * 1000:9.2f} ms | single pass {single_s * 1000:9.2f} ms"
+                f" | speedup {legacy_s / single_s:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Load-tests the API: keeps `--connections` keep-alive connections sending `GET /api/health/` for
+`--duration` seconds and reports requests per second and latency percentiles. With `--ingest`,
+that many ingestion jobs for `--tickers` are queued first, so the numbers show how the API holds up
+while ingestion runs.
+
+Without `--url`, a production server (`server.py --production`) is started for every combination
+of `--workers` and `--loop` and stopped afterwards. It takes its Mongo and OpenAI settings from the
+environment; more than one worker needs `INGESTION_JOB_STORE=mongo`. The load comes from this one
+process, so on a small machine it competes with the server for the same cores.
+
+Usage: python -m benchmarks.bench_server_load [--url http://localhost:8000] [--workers 1 2]
+           [--loop asyncio uvloop] [--connections 64] [--duration 10] [--ingest 0] [--tickers AAPL]
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+HEALTH_PATH = "/api/health/"
+CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+
+
+async def hammer(host: str, port: int, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f"GET {HEALTH_PATH} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            headers = await reader.readuntil(b"\r\n\r\n")
+            await reader.readexactly(int(CONTENT_LENGTH.search(headers).group(1)))
+            latencies.append(time.perf_counter() - start)
+            if not headers.startswith(b"HTTP/1.1 200"):
+                errors.append(1)
+    finally:
+        writer.close()
+
+
+async def queue_ingestion_jobs(base_url: str, jobs: int, tickers: List[str]) -> List[str]:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        responses = await asyncio.gather(*(
+            client.post("/api/ingestion/jobs", json={"tickers": tickers}) for _ in range(jobs)
+        ))
+    return [response.raise_for_status().json()["job_id"] for response in responses]
+
+
+async def job_statuses(base_url: str, job_ids: List[str]) -> List[str]:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        responses = await asyncio.gather(*(client.get(f"/api/ingestion/jobs/{job_id}") for job_id in job_ids))
+    return [response.json()["status"] for response in responses]
+
+
+async def load_test(base_url: str, connections: int, duration: float, ingest: int, tickers: List[str]) -> str:
+    url = urlsplit(base_url)
+    job_ids = await queue_ingestion_jobs(base_url, ingest, tickers) if ingest else []
+    latencies: List[float] = []
+    errors: List[int] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        hammer(url.hostname, url.port or 80, start + duration, latencies, errors) for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    summary = (
+        f"{len(latencies) / elapsed:8.0f} req/s | p50 {statistics.median(latencies) * 1000:6.1f} ms | "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.1f} ms | {len(errors)} errors"
+    )
+    if job_ids:
+        statuses = await job_statuses(base_url, job_ids)
+        summary += " | jobs " + ", ".join(f"{statuses.count(s)} {s}" for s in sorted(set(statuses)))
+    return summary
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, loop: str) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--production", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--loop", loop],
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            if httpx.get(base_url + HEALTH_PATH).status_code == 200:
+                return server, base_url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--loop", nargs="+", choices=["asyncio", "uvloop"], default=["asyncio", "uvloop"])
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--ingest", type=int, default=0)
+    parser.add_argument("--tickers", nargs="+", default=["AAPL"])
+    args = parser.parse_args()
+
+    def run(base_url: str) -> str:
+        return asyncio.run(load_test(base_url, args.connections, args.duration, args.ingest, args.tickers))
+
+    print(f"{args.connections} connections for {args.duration:.0f} s on {HEALTH_PATH}, {args.ingest} ingestion jobs")
+    if args.url:
+        print(f"{args.url}: {run(args.url)}")
+        return
+    for workers in args.workers:
+        for loop in args.loop:
+            label = f"{workers} workers, {loop:7s}"
+            try:
+                server, base_url = start_server(workers, loop)
+            except RuntimeError as e:
+                print(f"{label}: {e}")
+                continue
+            try:
+                print(f"{label}: {run(base_url)}")
+            finally:
+                stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
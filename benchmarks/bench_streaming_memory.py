@@ -0,0 +1,71 @@
+"""
+Measures peak Python memory of indexing one pdf as a whole (all pages, then all nodes and their
+embeddings held at once, as the batched path does) against streaming it a window of pages at a
+time, for growing page counts. Embeddings come from a mock model with ada-002's dimensions and
+are dropped once "written".
+
+Usage: python -m benchmarks.bench_streaming_memory [--pages 50 200 800] [--window 16]
+"""
+import argparse
+import time
+import tracemalloc
+
+from llama_index.core.embeddings import MockEmbedding
+
+import constants
+from benchmarks.bench_parallel_parse import make_text_pdf
+from ingestion.content_hash import assign_chunk_ids, assign_page_ids
+from ingestion.embedding import BatchEmbedder
+from ingestion.parsing import chunk_pages, extract_pdf_pages, iter_pdf_pages
+from ingestion.streaming import stream_document_pages
+
+EMBED_DIM = 1536
+
+
+def batched(pdf: bytes, embedder: BatchEmbedder) -> int:
+    pages = extract_pdf_pages(pdf, "bench.pdf", {constants.DB_DOC_ID_KEY: "bench"})
+    assign_page_ids("bench", pages)
+    nodes = chunk_pages(pages)
+    assign_chunk_ids("bench", nodes)
+    embedder.embed_nodes(nodes)
+    return len(nodes)
+
+
+def streamed(pdf: bytes, embedder: BatchEmbedder, window: int) -> int:
+    pages = iter_pdf_pages(pdf, "bench.pdf", {constants.DB_DOC_ID_KEY: "bench"})
+    result = stream_document_pages("bench", pages, lambda _, nodes: embedder.embed_nodes(nodes), window_size=window)
+    return len(result.chunks)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    nodes = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return nodes, peak / 1024 / 1024, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--window", type=int, default=constants.INGESTION_PAGE_WINDOW)
+    args = parser.parse_args()
+
+    embedder = BatchEmbedder(MockEmbedding(embed_dim=EMBED_DIM), max_concurrency=1)
+    print(f"window of {args.window} pages, {EMBED_DIM}-dimensional embeddings")
+    for pages in args.pages:
+        pdf = make_text_pdf(pages)
+        batched_nodes, batched_mb, batched_s = measure(batched, pdf, embedder)
+        streamed_nodes, streamed_mb, streamed_s = measure(streamed, pdf, embedder, args.window)
+        assert batched_nodes == streamed_nodes
+        print(
+            f"{pages:5d} pages ({len(pdf) / 1024 / 1024:5.1f} MB pdf, {batched_nodes:5d} nodes): "
+            f"batched peak {batched_mb:7.1f} MB in {batched_s:5.1f} s | "
+            f"streamed peak {streamed_mb:7.1f} MB in {streamed_s:5.1f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Compares the per-request `PyTickerSymbols` rebuild with the stored symbol index: startup cost
+(building the index, loading it from disk) and lookup cost (ticker to `Stock`, CIK to ticker
+against the <FILENAME> heuristic on a full-submission.txt header).
+
+Usage: python -m benchmarks.bench_symbol_index [--requests 20] [--lookups 100000]
+"""
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from pytickersymbols import PyTickerSymbols
+
+from benchmarks.bench_sec_header import HEADER
+from ingestion.file_utils import parse_ticker_symbol_from_full_submission_txt
+from ingestion.stock_utils import get_stocks_by_symbol
+from ingestion.symbol_index import SymbolIndex, build_symbol_index
+
+# A few well-known filers, as EDGAR's company_tickers_exchange.json maps them
+TICKER_TO_CIK = {"AAPL": "320193", "MSFT": "789019", "AMZN": "1018724", "GOOGL": "1652044", "NVDA": "1045810"}
+
+
+def per_request(requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        get_stocks_by_symbol(PyTickerSymbols().get_all_indices())
+    return (time.perf_counter() - start) / requests
+
+
+def cold_start(statement: str) -> float:
+    """Seconds `statement` takes in a fresh interpreter, imports included."""
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)"
+    return float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "symbol-index.json"
+        build_s = best_of(lambda: build_symbol_index(TICKER_TO_CIK))
+        build_symbol_index(TICKER_TO_CIK).save(path)
+        load_s = best_of(lambda: SymbolIndex.load(path))
+        index = SymbolIndex.load(path)
+        cold_build_s = cold_start("from ingestion.symbol_index import build_symbol_index; build_symbol_index()")
+        cold_load_s = cold_start(f"from ingestion.symbol_index import SymbolIndex; SymbolIndex.load(__import__('pathlib').Path({str(path)!r}))")
+        request_s = per_request(args.requests)
+
+        submission = Path(temp_dir) / "full-submission.txt"
+        submission.write_text(HEADER)
+        symbols = list(index.stocks)
+        ciks = list(TICKER_TO_CIK.values())
+
+        start = time.perf_counter()
+        for i in range(args.lookups):
+            index.stock(symbols[i % len(symbols)])
+        stock_s = (time.perf_counter() - start) / args.lookups
+
+        start = time.perf_counter()
+        for i in range(args.lookups):
+            index.symbol_for_cik(ciks[i % len(ciks)])
+        cik_s = (time.perf_counter() - start) / args.lookups
+
+        heuristic_lookups = max(1, args.lookups // 100)
+        start = time.perf_counter()
+        for _ in range(heuristic_lookups):
+            parse_ticker_symbol_from_full_submission_txt(submission)
+        heuristic_s = (time.perf_counter() - start) / heuristic_lookups
+
+    print(f"{len(index)} stocks, {len(index.cik_to_symbol)} CIKs, index file {path.name}")
+    print(f"startup: per-request rebuild {request_s * 1000:8.2f} ms | build index {build_s * 1000:8.2f} ms"
+          f" | load index {load_s * 1000:8.2f} ms")
+    print(f"cold start (imports included): build index {cold_build_s * 1000:8.2f} ms"
+          f" | load index {cold_load_s * 1000:8.2f} ms")
+    print(f"lookup:  ticker -> Stock {stock_s * 1e9:8.0f} ns | CIK -> ticker {cik_s * 1e9:8.0f} ns"
+          f" | <FILENAME> heuristic {heuristic_s * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
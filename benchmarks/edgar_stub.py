@@ -0,0 +1,118 @@
+"""
+Local stand-in for the EDGAR endpoints used by `ingestion.sec_downloader`, so downloads can be
+exercised offline. It serves a ticker to CIK mapping, submissions JSON with `filings_per_form`
+10-K and 10-Q filings per ticker, and synthetic full-submission.txt / primary documents.
+
+Usage: python -m benchmarks.edgar_stub [--port 8765] [--latency 0.05]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from benchmarks.bench_sec_header import HEADER, FISCAL_PERIOD_FOCUS
+
+FORMS = ("10-K", "10-Q")
+
+
+def _cik(index: int) -> int:
+    return 1000 + index
+
+
+def _accession_number(cik: int, form: str, index: int) -> str:
+    return f"{cik:010d}-22-{FORMS.index(form)}{index:05d}"
+
+
+class EdgarStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, tickers: List[str], filings_per_form: int = 4, latency: float = 0.0, throttle_every: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.tickers = [ticker.upper() for ticker in tickers]
+        self.filings_per_form = filings_per_form
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "EdgarStub":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def ticker_for_cik(self, cik: int) -> str:
+        return self.tickers[cik - 1000]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: EdgarStub
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes, status: int = 200, content_type: str = "application/octet-stream"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server._count_lock:
+            self.server.request_count += 1
+            count = self.server.request_count
+        time.sleep(self.server.latency)
+        if self.server.throttle_every and count % self.server.throttle_every == 0:
+            return self._send(b"", status=429)
+
+        if self.path == "/files/company_tickers_exchange.json":
+            data = [[_cik(i), f"{ticker} Inc.", ticker, "Nasdaq"] for i, ticker in enumerate(self.server.tickers)]
+            return self._send(json.dumps({"fields": ["cik", "name", "ticker", "exchange"], "data": data}).encode())
+
+        match = re.fullmatch(r"/submissions/CIK(\d{10})\.json", self.path)
+        if match:
+            cik = int(match.group(1))
+            recent = {"accessionNumber": [], "form": [], "primaryDocument": [], "filingDate": []}
+            ticker = self.server.ticker_for_cik(cik).lower()
+            for index in range(self.server.filings_per_form):
+                for form in FORMS:
+                    recent["accessionNumber"].append(_accession_number(cik, form, index))
+                    recent["form"].append(form)
+                    recent["primaryDocument"].append(f"{ticker}-2022{index:04d}.htm")
+                    recent["filingDate"].append(f"2022-{12 - index:02d}-01")
+            return self._send(json.dumps({"cik": str(cik), "filings": {"recent": recent, "files": []}}).encode())
+
+        match = re.fullmatch(r"/Archives/edgar/data/(\d+)/(\d{18})/(.+)", self.path)
+        if match:
+            ticker = self.server.ticker_for_cik(int(match.group(1))).lower()
+            if match.group(3).endswith(".txt"):
+                body = HEADER.replace("aapl", ticker) + FISCAL_PERIOD_FOCUS
+            else:
+                body = f"<html><body><p>{ticker} primary document</p></body></html>"
+            return self._send(body.encode(), content_type="text/html")
+
+        self._send(b"not found", status=404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tickers", nargs="+", default=["AAPL", "MSFT", "TSLA"])
+    args = parser.parse_args()
+    stub = EdgarStub(args.port, args.tickers, latency=args.latency)
+    print(f"Serving EDGAR stand-in on {stub.url}")
+    stub.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 DEFAULT_OUTPUT_DIR = "/app/data/"
+FILINGS_MANIFEST_FILE_NAME = "filings-manifest.sqlite3"
+SYMBOL_INDEX_FILE_NAME = "symbol-index.json"
+FILING_DISCOVERY_WORKERS = 8
 DEFAULT_CIKS = [
         "AAPL",
         "TSLA",
@@ -11,20 +14,87 @@ DEFAULT_FILING_TYPES = [
 
 SEC_EDGAR_COMPANY_NAME="MyCompanyName"
 SEC_EDGAR_EMAIL="my.email@domain.com"
+SEC_EDGAR_WWW_URL = "https://www.sec.gov"
+SEC_EDGAR_DATA_URL = "https://data.sec.gov"
+# SEC allows at most 10 requests per second: https://www.sec.gov/os/webmaster-faq#developers
+SEC_EDGAR_REQUESTS_PER_SECOND = 10
+SEC_DOWNLOAD_WORKERS = 8
+PDF_CONVERSION_WORKERS = 4
+PDF_CONVERSION_TIMEOUT_SECONDS = 300
+S3_UPLOAD_WORKERS = 8
+S3_MULTIPART_THRESHOLD_MB = 16
+S3_MULTIPART_CHUNKSIZE_MB = 16
+S3_MULTIPART_CONCURRENCY = 4
+S3_UPLOAD_RECORD_FILE_NAME = "s3-uploads.sqlite3"
+DOCUMENT_FETCH_MAX_CONNECTIONS = 20
+DOCUMENT_FETCH_CONCURRENCY = 8
+DOCUMENT_FETCH_RETRIES = 3
+DOCUMENT_FETCH_TIMEOUT_SECONDS = 60
+# Size of the pseudo pages html documents without page breaks are split into, roughly one printed page
+HTML_PSEUDO_PAGE_CHARS = 3000
 BUCKET_NAME="finaillm"
 
 # Database
 DB_NAME="finaillm-sec-documents"
 COLLECTION_NAME = "sec-documents"
 CONVERSATION_COLLECTION_NAME="conversations"
+INGESTION_JOBS_COLLECTION_NAME = "ingestion-jobs"
+INGESTION_JOB_EVENTS_COLLECTION_NAME = "ingestion-job-events"
 MESSAGES_COLLECTION_NAME="messages"
 VECTOR_COLLECTION_NAME = "{}-vectors".format(COLLECTION_NAME)
 INDEX_NAMESPACE ="{}-index".format(COLLECTION_NAME)
 DOCSTORE_NAMESPACE = "{}-docs".format(COLLECTION_NAME)
 VECTOR_INDEX_NAME = "{}-vector-index".format(COLLECTION_NAME)
 DB_DOC_ID_KEY = "db_document_id"
+MONGODB_APP_NAME = "finaillm-ingestion"
+MONGODB_MAX_POOL_SIZE = 50
+MONGODB_MIN_POOL_SIZE = 0
+# Idle connections are closed after this long
+MONGODB_MAX_IDLE_TIME_MS = 300000
+# A caller waiting longer than this for a free connection gets an error instead of queueing on
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = 30000
 
 #LLM
 NODE_PARSER_CHUNK_SIZE = 512
 NODE_PARSER_CHUNK_OVERLAP = 10
 OPENAI_TOOL_LLM_NAME = "gpt-3.5-turbo"
+# Documents whose nodes are embedded and written to the vector store together
+INDEX_BUILD_DOCUMENT_BATCH = 8
+# Threads for blocking index building, and how many more tasks may wait for one
+INGESTION_EXECUTOR_WORKERS = 4
+INGESTION_EXECUTOR_MAX_QUEUED = 8
+# Pipeline stage workers; the stages share the ingestion executor's threads for blocking work
+PIPELINE_STORE_CONCURRENCY = 4
+# Documents upserted per unordered Mongo bulk write
+MONGO_BULK_WRITE_BATCH_SIZE = 500
+# URLs looked up per `$in` query when planning an ingestion run
+INGESTION_PLAN_LOOKUP_BATCH_SIZE = 1000
+PIPELINE_PARSE_CONCURRENCY = 2
+# Processes that parse pdf page ranges and chunk pages; None uses every core
+PARSE_PROCESS_WORKERS = None
+# Pages per parse or chunk task; smaller documents are handled in the calling thread
+PARSE_PAGES_PER_TASK = 25
+# Documents at least this large are ingested a window of pages at a time, so memory does not grow
+# with their size; smaller ones are batched with other documents
+INGESTION_STREAMING_MIN_BYTES = 4 * 1024 * 1024
+INGESTION_PAGE_WINDOW = 16
+PIPELINE_STATS_INTERVAL_SECONDS = 5.0
+# Background ingestion jobs: "mongo", or "memory" for a single process without a database
+INGESTION_JOB_STORE = "mongo"
+INGESTION_JOB_WORKERS = 2
+INGESTION_JOB_MAX_ATTEMPTS = 3
+# A running job whose worker stops renewing its lease is picked up again by another worker
+INGESTION_JOB_LEASE_SECONDS = 120
+INGESTION_JOB_POLL_SECONDS = 2.0
+EMBEDDING_BATCH_MAX_TOKENS = 64000
+EMBEDDING_MAX_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 5
+VECTOR_STORE_WRITE_BATCH_SIZE = 1000
+EMBEDDING_CACHE_FILE_NAME = "embedding-cache.sqlite3"
+EMBEDDING_CACHE_MEMORY_ENTRIES = 4096
+
+# Server
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
+# Worker processes in production mode, unless WEB_CONCURRENCY is set
+SERVER_WORKERS = 2
@@ -1,21 +1,170 @@
+"""
+The process's Mongo connection pool.
 
+The API, the job store and llama-index's storage all go through one client: the Motor client for
+the event loop, and its underlying `MongoClient` for the synchronous stores on ingestion threads.
+Its size, idle timeout and how long a caller may wait for a connection come from constants, and a
+pool listener keeps metrics on how many connections are checked out and how long checkouts wait.
+Sessions are only handed out scoped, so they are always ended.
+"""
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
 
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.client_session import ClientSession
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from pymongo import MongoClient
+from pymongo import monitoring
+
+import constants
 from core.config import settings
 from logger import logger
-import nest_asyncio
-nest_asyncio.apply()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool events, counted across the client's pools (one per server)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.sessions = 0
+        self.pools_cleared = 0
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_checked_out(self, event):
+        wait = event.duration or 0.0
+        with self._lock:
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def session_started(self) -> None:
+        with self._lock:
+            self.sessions += 1
+
+    def session_ended(self) -> None:
+        with self._lock:
+            self.sessions -= 1
+
+    # Events without anything to count
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "open_connections": self.open,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": sum(self.checkout_failures.values()),
+                "checkout_timeouts": self.checkout_failures.get(monitoring.ConnectionCheckOutFailedReason.TIMEOUT, 0),
+                "avg_wait_ms": 1000 * self.wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+                "active_sessions": self.sessions,
+                "pools_cleared": self.pools_cleared,
+            }
+
 
 class MongoDB:
-    def __init__(self, database_url: str):
-        self.client = AsyncIOMotorClient(database_url)
-        self.database = self.client.get_database()
+    def __init__(
+        self,
+        uri: str = settings.MONGODB_URI,
+        max_pool_size: int = constants.MONGODB_MAX_POOL_SIZE,
+        min_pool_size: int = constants.MONGODB_MIN_POOL_SIZE,
+        max_idle_time_ms: int = constants.MONGODB_MAX_IDLE_TIME_MS,
+        wait_queue_timeout_ms: int = constants.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    ):
+        self.metrics = PoolMetrics()
+        self.client = AsyncIOMotorClient(
+            uri,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            maxIdleTimeMS=max_idle_time_ms,
+            waitQueueTimeoutMS=wait_queue_timeout_ms,
+            appname=constants.MONGODB_APP_NAME,
+            event_listeners=[self.metrics],
+        )
+        self.database: AsyncIOMotorDatabase = self.client[constants.DB_NAME]
+
+    @property
+    def sync_client(self) -> MongoClient:
+        """The `MongoClient` under the Motor client, sharing its pool, for use off the event loop."""
+        return self.client.delegate
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncIOMotorClientSession]:
+        """A session that is ended when the block exits, however it exits."""
+        session = await self.client.start_session()
+        self.metrics.session_started()
+        try:
+            yield session
+        finally:
+            await session.end_session()
+            self.metrics.session_ended()
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_mongodb: Optional[MongoDB] = None
+_lock = threading.Lock()
+
+
+def get_mongodb() -> MongoDB:
+    """The process-wide pool, created on first use (by each server worker on startup)."""
+    global _mongodb
+    with _lock:
+        if _mongodb is None:
+            logger.info("Creating the Mongo connection pool")
+            _mongodb = MongoDB()
+        return _mongodb
 
-    async def get_session(self) -> ClientSession:
-        logger.info("MonogDB get_session..........")
-        return await self.client.start_session()
-        
 
-# Create a global MongoDB instance
-mongodb = MongoDB(settings.DATABASE_URL)
\ No newline at end of file
+def close_mongodb() -> None:
+    """Closes the pool; the next `get_mongodb` starts a fresh one."""
+    global _mongodb
+    with _lock:
+        if _mongodb is not None:
+            logger.info("Closing the Mongo connection pool")
+            _mongodb.close()
+        _mongodb = None
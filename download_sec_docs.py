@@ -1,16 +1,28 @@
 import os
-import boto3
+import time
 import pdfkit
 import shutil
-from sec_edgar_downloader import Downloader
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from typing import List, Optional
 from pathlib import Path
-from tqdm.contrib.itertools import product
-from botocore.exceptions import NoCredentialsError
+from itertools import product
 import constants
 from logger import logger
+from ingestion.sec_downloader import ConcurrentDownloader, EdgarClient, ProgressCallback, no_progress
+from ingestion.s3_uploader import get_s3_uploader
+from ingestion.symbol_index import update_symbol_index_ciks
 
-from constants import SEC_EDGAR_COMPANY_NAME, SEC_EDGAR_EMAIL, DEFAULT_CIKS, DEFAULT_FILING_TYPES, DEFAULT_OUTPUT_DIR
+from constants import (
+    DEFAULT_CIKS,
+    DEFAULT_FILING_TYPES,
+    DEFAULT_OUTPUT_DIR,
+    SEC_DOWNLOAD_WORKERS,
+    PDF_CONVERSION_WORKERS,
+    PDF_CONVERSION_TIMEOUT_SECONDS,
+    S3_UPLOAD_WORKERS,
+)
 
 
 def _filing_exists(cik: str, filing_type: str, output_dir: str) -> bool:
@@ -18,30 +30,59 @@ def _filing_exists(cik: str, filing_type: str, output_dir: str) -> bool:
     data_dir = Path(output_dir) / "sec-edgar-filings"
     filing_dir = data_dir / cik / filing_type
     return filing_dir.exists()
-    
-def _download_filing(cik: str, filing_type: str, output_dir: str, limit=None, before=None, after=None):
-    print("_download_filing")
-    dl = Downloader(SEC_EDGAR_COMPANY_NAME, SEC_EDGAR_EMAIL, output_dir)
-    dl.get(filing_type, cik, limit=limit, before=before, after=after, download_details=True)
 
 def upload_to_s3(file_path):
-    s3_client = boto3.client('s3',
-        aws_access_key_id=os.environ["AWS_ACCESS_KEY"],
-        aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"]
-    )
-    s3_key = file_path.split('data/')[1]
+    result = get_s3_uploader().upload(file_path)
+    if result.uploaded:
+        print(f"File uploaded successfully to s3://{constants.BUCKET_NAME}/{result.key}")
+    elif result.skipped:
+        print(f"File s3://{constants.BUCKET_NAME}/{result.key} is up to date, skipping")
+    return result.error is None
+
+@dataclass
+class ConversionReport:
+    converted: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    uploaded: int = 0
+    upload_failed: int = 0
+    converted_bytes: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        rate = self.converted / self.seconds if self.seconds else 0.0
+        mb_rate = self.converted_bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+        return (
+            f"Converted {self.converted} files to pdf ({self.failed} failed, {self.timed_out} timed out), "
+            f"uploaded {self.uploaded} ({self.upload_failed} failed) in {self.seconds:.1f}s: "
+            f"{rate:.2f} files/s, {mb_rate:.2f} MB/s of html"
+        )
+
+
+def _convert_file(input_path: str, output_path: str, timeout: float) -> None:
+    """Converts one html file to pdf with wkhtmltopdf, killing it after `timeout` seconds."""
+    # Render to a temporary name so a killed or failed conversion never leaves a pdf behind
+    # that the filing discovery would pick up.
+    temp_path = str(Path(output_path).with_name(f".{Path(output_path).stem}.part.pdf"))
+    # fix for issue here:
+    # https://github.com/wkhtmltopdf/wkhtmltopdf/issues/4460#issuecomment-661345113
+    # Not quiet: wkhtmltopdf exits with 1 when only relative images or css are missing, which
+    # `handle_error` tolerates by the "Done" line it prints last
+    options = {'enable-local-file-access': None}
+    command = pdfkit.PDFKit(input_path, "file", options=options).command(temp_path)
     try:
-        # Upload the file
-        s3_client.upload_file(file_path, constants.BUCKET_NAME, s3_key)
-        print(f"File uploaded successfully to s3://{constants.BUCKET_NAME}/{s3_key}")
-    except FileNotFoundError:
-        print(f"The file {file_path} was not found")
-    except NoCredentialsError:
-        print("Credentials not available")
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+        pdfkit.PDFKit.handle_error(result.returncode, result.stderr.decode("utf-8", errors="replace"))
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            raise IOError(f"wkhtmltopdf wrote an empty pdf for {input_path}")
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
-def _convert_to_pdf(output_dir: str):
-    """Converts all html files in a directory to pdf files."""
 
+def _html_files_to_convert(output_dir: str) -> List[Path]:
     # NOTE: directory structure is assumed to be:
     # output_dir
     # ├── sec-edgar-filings
@@ -53,25 +94,98 @@ def _convert_to_pdf(output_dir: str):
 
     data_dir = Path(output_dir) / "sec-edgar-filings"
     print(data_dir)
+    to_convert = []
     for cik_dir in data_dir.iterdir():
         for filing_type_dir in cik_dir.iterdir():
             for filing_dir in filing_type_dir.iterdir():
                 filing_doc = filing_dir / "primary-document.html"
                 filing_pdf = filing_dir / "primary-document.pdf"
                 if filing_doc.exists() and not filing_pdf.exists():
-                    print("- Converting {}".format(filing_doc))
-                    input_path = str(filing_doc.absolute())
-                    output_path = str(filing_pdf.absolute())
-                    try:
-                        # fix for issue here:
-                        # https://github.com/wkhtmltopdf/wkhtmltopdf/issues/4460#issuecomment-661345113
-                        options = {'enable-local-file-access': None}
-                        pdfkit.from_file(input_path, output_path, options=options, verbose=True)
-
-                        upload_to_s3(output_path)
-                        
-                    except Exception as e:
-                        print(f"Error converting {input_path} to {output_path}: {e}")
+                    to_convert.append(filing_doc)
+    return to_convert
+
+
+def _convert_to_pdf(
+    output_dir: str,
+    max_workers: int = PDF_CONVERSION_WORKERS,
+    timeout: float = PDF_CONVERSION_TIMEOUT_SECONDS,
+    upload_workers: int = S3_UPLOAD_WORKERS,
+    progress: ProgressCallback = no_progress,
+) -> ConversionReport:
+    """
+    Converts all html files in a directory to pdf files and uploads them to S3.
+
+    Up to `max_workers` wkhtmltopdf processes run at the same time, each killed after `timeout`
+    seconds. Every finished pdf is handed to a separate upload pool, so uploads overlap with the
+    remaining conversions instead of holding them up. `progress` is told about every conversion.
+    """
+    report = ConversionReport()
+    start = time.perf_counter()
+    to_convert = _html_files_to_convert(output_dir)
+    print(f"Converting {len(to_convert)} html files with {max_workers} workers")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as convert_pool, \
+            ThreadPoolExecutor(max_workers=upload_workers) as upload_pool:
+        conversions = {}
+        for filing_doc in to_convert:
+            input_path = str(filing_doc.absolute())
+            output_path = str(filing_doc.with_suffix(".pdf").absolute())
+            conversions[convert_pool.submit(_convert_file, input_path, output_path, timeout)] = (input_path, output_path)
+
+        uploads = {}
+        for done, future in enumerate(as_completed(conversions), start=1):
+            input_path, output_path = conversions[future]
+            try:
+                future.result()
+            except subprocess.TimeoutExpired:
+                report.timed_out += 1
+                report.errors.append(f"Timed out after {timeout}s converting {input_path}")
+                progress("error", report.errors[-1])
+            except Exception as e:
+                report.failed += 1
+                report.errors.append(f"Error converting {input_path} to {output_path}: {e}")
+                progress("error", report.errors[-1])
+            else:
+                report.converted += 1
+                report.converted_bytes += os.path.getsize(input_path)
+                uploads[upload_pool.submit(upload_to_s3, output_path)] = output_path
+                progress("converted", f"[{done}/{len(conversions)}] Converted {output_path}")
+            print(f"- [{done}/{len(conversions)}] {input_path}")
+
+        for future in as_completed(uploads):
+            try:
+                uploaded = future.result()
+            except Exception as e:
+                uploaded = False
+                report.errors.append(f"Error uploading {uploads[future]}: {e}")
+            if uploaded:
+                report.uploaded += 1
+            else:
+                report.upload_failed += 1
+                progress("error", f"Error uploading {uploads[future]}")
+
+    report.seconds = time.perf_counter() - start
+    for error in report.errors:
+        print(error)
+    print(report.summary())
+    return report
+
+def _upload_html(output_dir: str, ciks: List[str], progress: ProgressCallback = no_progress) -> None:
+    """Uploads the html primary documents of the given tickers, for ingestion runs that skip the pdf."""
+    data_dir = Path(output_dir) / "sec-edgar-filings"
+    html_paths = [
+        str(path.absolute())
+        for cik in ciks
+        for path in sorted((data_dir / cik).glob("*/*/primary-document.html"))
+    ]
+    results = get_s3_uploader().upload_many(html_paths)
+    message = (
+        f"Uploaded {sum(r.uploaded for r in results)} of {len(html_paths)} html files, "
+        f"{sum(r.skipped for r in results)} already up to date"
+    )
+    print(message)
+    progress("uploaded", message)
+
 
 def sec_download(
     output_dir: str = DEFAULT_OUTPUT_DIR,
@@ -81,7 +195,16 @@ def sec_download(
     after: Optional[str] = None,
     limit: Optional[int] = 3,
     convert_to_pdf: bool = True,
+    max_workers: int = SEC_DOWNLOAD_WORKERS,
+    client: Optional[EdgarClient] = None,
+    conversion_workers: int = PDF_CONVERSION_WORKERS,
+    upload_html: bool = False,
+    progress: ProgressCallback = no_progress,
 ):
+    """
+    Downloads the filings of `ciks`, then converts them to pdf and/or uploads the html to S3.
+    `progress` is called with an event name and a message as tickers and filings complete.
+    """
     print('Downloading filings to "{}"'.format(Path(output_dir).absolute()))
     print("File Types: {}".format(file_types))
     print("Convert To PDF: {}".format(convert_to_pdf))
@@ -92,18 +215,28 @@ def sec_download(
                 "please install it to convert html to pdf "
                 "`sudo apt-get install wkhtmltopdf`"
             )
+    pairs = []
     for symbol, file_type in product(ciks, file_types):
+        if _filing_exists(symbol, file_type, output_dir):
+            print(f"- Filing for {symbol} {file_type} already exists, skipping")
+            progress("skipped", f"{file_type} filings for {symbol} already downloaded")
+        else:
+            print(f"- Downloading filing for {symbol} {file_type}")
+            pairs.append((symbol, file_type))
+
+    if pairs:
+        downloader = ConcurrentDownloader(output_dir, client=client, max_workers=max_workers)
+        downloader.download(pairs, limit=limit, before=before, after=after, progress=progress)
         try:
-            if _filing_exists(symbol, file_type, output_dir):
-                print(f"- Filing for {symbol} {file_type} already exists, skipping")
-            else:
-                print(f"- Downloading filing for {symbol} {file_type}")
-                _download_filing(symbol, file_type, output_dir, limit, before, after)
+            # Already fetched by the listings, so this only records the CIKs for the symbol index
+            update_symbol_index_ciks(downloader.client.ticker_to_cik())
         except Exception as e:
-            print(
-                f"Error downloading filing for symbol={symbol} & file_type={file_type}: {e}"
-            )
+            logger.warning(f"Could not update the symbol index CIKs: {e}")
 
     if convert_to_pdf:
         print("Converting html files to pdf files")
-        _convert_to_pdf(output_dir)
\ No newline at end of file
+        _convert_to_pdf(output_dir, max_workers=conversion_workers, progress=progress)
+
+    if upload_html:
+        print("Uploading html files")
+        _upload_html(output_dir, ciks, progress=progress)
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Content hashes for incremental re-ingestion.
+
+A document records the hash of its source file and of its extracted text, and its pages and nodes
+get ids derived from the document id and their content. Re-ingesting a changed filing then
+produces the same ids for every unchanged chunk, so only chunks with new ids are embedded and
+written, and only ids that disappeared are deleted.
+"""
+import hashlib
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+from llama_index.core.schema import BaseNode, Document as LlamaIndexDocument, MetadataMode, NodeRelationship
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(CHUNK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_stat(path: Union[str, Path]) -> Dict[str, int]:
+    stat = os.stat(path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+class TextHasher:
+    """Hash of the extracted text, page by page, including the page labels citations point at."""
+
+    def __init__(self):
+        self._digest = hashlib.sha256()
+
+    def update(self, llama_index_docs: Iterable[LlamaIndexDocument]) -> None:
+        for llama_index_doc in llama_index_docs:
+            self._digest.update(str(llama_index_doc.metadata.get("page_label", "")).encode("utf-8"))
+            self._digest.update(b"\0")
+            self._digest.update(llama_index_doc.text.encode("utf-8"))
+            self._digest.update(b"\0")
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+def text_sha256(llama_index_docs: List[LlamaIndexDocument]) -> str:
+    hasher = TextHasher()
+    hasher.update(llama_index_docs)
+    return hasher.hexdigest()
+
+
+def page_id(doc_id: str, page_index: int) -> str:
+    return f"{doc_id}-page-{page_index}"
+
+
+def assign_page_ids(doc_id: str, llama_index_docs: List[LlamaIndexDocument], first_page_index: int = 0) -> None:
+    """Gives pages stable ids, so a re-ingested page overwrites its earlier version in the docstore."""
+    for page_index, llama_index_doc in enumerate(llama_index_docs, start=first_page_index):
+        llama_index_doc.id_ = page_id(doc_id, page_index)
+
+
+class ChunkIdAssigner:
+    """
+    Replaces the random node ids with ids derived from the text that gets embedded, numbering
+    repeated chunks within the document, and relinks the previous/next relationships to them.
+    A document's nodes can be passed in several calls, in order, when it is read a window of pages
+    at a time.
+    """
+
+    def __init__(self, doc_id: str):
+        self.doc_id = doc_id
+        self._occurrences: Counter = Counter()
+
+    def assign(self, nodes: List[BaseNode]) -> None:
+        new_ids: Dict[str, str] = {}
+        for node in nodes:
+            digest = hashlib.sha256(node.get_content(metadata_mode=MetadataMode.EMBED).encode("utf-8")).hexdigest()
+            self._occurrences[digest] += 1
+            new_ids[node.node_id] = f"{self.doc_id}-{digest[:40]}-{self._occurrences[digest]}"
+        for node in nodes:
+            node.id_ = new_ids[node.node_id]
+            for relationship in (NodeRelationship.PREVIOUS, NodeRelationship.NEXT):
+                related = node.relationships.get(relationship)
+                if related is not None and related.node_id in new_ids:
+                    related.node_id = new_ids[related.node_id]
+
+
+def assign_chunk_ids(doc_id: str, nodes: List[BaseNode]) -> None:
+    ChunkIdAssigner(doc_id).assign(nodes)
@@ -0,0 +1,170 @@
+"""
+Batched embedding of nodes collected across many documents.
+
+`VectorStoreIndex.from_documents` embeds each document's nodes on its own, so small filings end up
+in small requests and every document pays a full round trip. `BatchEmbedder` packs nodes from any
+number of documents into batches bounded by token and input count, sends several batches at once
+and backs off adaptively when the embedding API starts failing or throttling.
+
+Ingestion embeds from several places at once (the embed stage, and every large document streamed
+through the parse stage), so they share one process-wide embedder from `get_batch_embedder`: one
+bound on requests in flight and one backoff state, so throttling seen by one slows them all.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+import constants
+from ingestion.embedding_cache import EmbeddingCache, embedding_model_key, get_embedding_cache
+from llm import LLM
+from logger import logger
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit that halves on every failure and grows back by one on every success (AIMD),
+    so a throttled API gets fewer requests in flight until it recovers.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, success: bool) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if success:
+                self.limit = min(self.max_limit, self.limit + 1)
+            else:
+                self.limit = max(1, self.limit // 2)
+            self._condition.notify_all()
+
+
+class BatchEmbedder:
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        max_batch_tokens: int = constants.EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_size: Optional[int] = None,
+        max_concurrency: int = constants.EMBEDDING_MAX_CONCURRENCY,
+        max_retries: int = constants.EMBEDDING_MAX_RETRIES,
+        backoff_seconds: float = 1.0,
+        tokenizer: Optional[Callable[[str], List]] = None,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.embed_model = embed_model
+        self.cache = cache
+        self.model_key = embedding_model_key(embed_model)
+        self.max_batch_tokens = max_batch_tokens
+        # By default a batch is exactly one request to the embedding API
+        self.max_batch_size = max_batch_size or embed_model.embed_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.tokenizer = tokenizer or get_tokenizer()
+        # Shared by every `embed_nodes` call, so concurrent callers together stay within the limit
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+
+    def batches(self, texts: Sequence[str]) -> Iterator[List[int]]:
+        """Groups text indices into batches of at most `max_batch_size` texts and `max_batch_tokens` tokens."""
+        batch: List[int] = []
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = len(self.tokenizer(text))
+            if batch and (len(batch) == self.max_batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        concurrency = self.concurrency
+        for attempt in range(self.max_retries + 1):
+            concurrency.acquire()
+            try:
+                embeddings = self.embed_model.get_text_embedding_batch(texts)
+            except Exception as e:
+                concurrency.release(success=False)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * 2 ** attempt * (1 + random.random())
+                logger.warning(
+                    f"Embedding batch of {len(texts)} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s "
+                    f"with concurrency {concurrency.limit}"
+                )
+                time.sleep(delay)
+            else:
+                concurrency.release(success=True)
+                return embeddings
+
+    def embed_nodes(self, nodes: Sequence[BaseNode]) -> None:
+        """
+        Sets `embedding` on every node that does not have one yet, the same text `VectorStoreIndex` embeds.
+        Texts found in the cache are not sent, and identical texts are embedded once.
+        """
+        to_embed = [node for node in nodes if node.embedding is None]
+        if not to_embed:
+            return
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in to_embed]
+        embeddings: Dict[str, List[float]] = {}
+        if self.cache is not None:
+            embeddings = self.cache.get_many(self.model_key, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+
+        batches = list(self.batches(missing))
+        start = time.perf_counter()
+        results = self._pool.map(lambda batch: self._embed_batch([missing[i] for i in batch]), batches)
+        for batch, batch_embeddings in zip(batches, results):
+            batch_texts = [missing[i] for i in batch]
+            embeddings.update(zip(batch_texts, batch_embeddings))
+            if self.cache is not None:
+                self.cache.put_many(self.model_key, batch_texts, batch_embeddings)
+        for node, text in zip(to_embed, texts):
+            node.embedding = embeddings[text]
+
+        seconds = time.perf_counter() - start
+        logger.info(
+            f"Embedded {len(missing)} of {len(to_embed)} nodes in {len(batches)} batches in {seconds:.1f}s "
+            f"({len(missing) / seconds if seconds else 0:.1f} nodes/s)"
+        )
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+
+
+_batch_embedder: Optional[BatchEmbedder] = None
+_batch_embedder_lock = threading.Lock()
+
+
+def get_batch_embedder() -> BatchEmbedder:
+    """Process-wide `BatchEmbedder` for the configured embedding model and cache, created on first use."""
+    global _batch_embedder
+    with _batch_embedder_lock:
+        if _batch_embedder is None:
+            _batch_embedder = BatchEmbedder(LLM.embedding_model, cache=get_embedding_cache())
+        return _batch_embedder
+
+
+def shutdown_batch_embedder() -> None:
+    global _batch_embedder
+    with _batch_embedder_lock:
+        if _batch_embedder is not None:
+            _batch_embedder.shutdown()
+            _batch_embedder = None
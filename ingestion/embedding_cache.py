@@ -0,0 +1,122 @@
+"""
+Content-addressed cache of chunk embeddings.
+
+Filings of the same company repeat much of their boilerplate from quarter to quarter, so the same
+chunk text keeps coming back for embedding. Embeddings are keyed by a hash of the embedding model
+and the exact text that would be embedded, kept in a local SQLite store and fronted by an
+in-memory LRU.
+"""
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+import constants
+
+# Maximum number of bound parameters per SQLite lookup
+_LOOKUP_CHUNK = 500
+
+
+def embedding_model_key(embed_model: BaseEmbedding) -> str:
+    """Identifies the model whose embeddings are cached; any change in it invalidates the cache."""
+    key = f"{embed_model.class_name()}:{embed_model.model_name}"
+    dimensions = getattr(embed_model, "dimensions", None)
+    return f"{key}:{dimensions}" if dimensions else key
+
+
+def text_key(model_key: str, text: str) -> str:
+    return hashlib.sha256(f"{model_key}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[Path] = None, max_memory_entries: int = constants.EMBEDDING_CACHE_MEMORY_ENTRIES):
+        self.path = Path(path or Path(constants.DEFAULT_OUTPUT_DIR) / constants.EMBEDDING_CACHE_FILE_NAME)
+        self.max_memory_entries = max_memory_entries
+        # Embeddings are held as packed float64 arrays, a fraction of the size of lists of floats
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, embedding BLOB)")
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model_key: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Returns the cached embeddings of the given texts, leaving out the ones not cached."""
+        keys = {text_key(model_key, text): text for text in set(texts)}
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for key in keys:
+                blob = self._memory.get(key)
+                if blob is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = blob
+            self.memory_hits += len(found)
+
+            remaining = [key for key in keys if key not in found]
+            if remaining:
+                with closing(self._connect()) as conn:
+                    for i in range(0, len(remaining), _LOOKUP_CHUNK):
+                        chunk = remaining[i:i + _LOOKUP_CHUNK]
+                        rows = conn.execute(
+                            f"SELECT key, embedding FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                        ).fetchall()
+                        for key, blob in rows:
+                            found[key] = blob
+                            self._remember(key, blob)
+                            self.disk_hits += 1
+            self.misses += len(keys) - len(found)
+
+        return {keys[key]: array("d", blob).tolist() for key, blob in found.items()}
+
+    def put_many(self, model_key: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        rows = [(text_key(model_key, text), model_key, array("d", embedding).tobytes()) for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            for key, _, blob in rows:
+                self._remember(key, blob)
+
+    def stats(self) -> Dict[str, float]:
+        """Lookups since start-up, counted once per distinct text per `get_many`."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide `EmbeddingCache`, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
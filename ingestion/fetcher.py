@@ -0,0 +1,76 @@
+"""
+Shared async HTTP client for fetching documents that have no local copy.
+
+Every fetch goes through one pooled keep-alive `httpx.AsyncClient`, so documents from the same host
+reuse connections instead of paying a TCP/TLS handshake each, and the number of fetches in flight
+is bounded. Throttling, server errors and transport failures are retried with backoff.
+"""
+import asyncio
+import random
+from typing import Optional
+
+import httpx
+
+import constants
+from logger import logger
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DocumentFetcher:
+    def __init__(
+        self,
+        max_connections: int = constants.DOCUMENT_FETCH_MAX_CONNECTIONS,
+        max_concurrency: int = constants.DOCUMENT_FETCH_CONCURRENCY,
+        max_retries: int = constants.DOCUMENT_FETCH_RETRIES,
+        timeout: float = constants.DOCUMENT_FETCH_TIMEOUT_SECONDS,
+        backoff_seconds: float = 0.5,
+    ):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(self, url: str) -> bytes:
+        """Returns the body of `url`, raising `httpx.HTTPStatusError` once retries are exhausted."""
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._client.get(url)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    reason = type(e).__name__
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                        response.raise_for_status()
+                        return response.content
+                    reason = f"HTTP {response.status_code}"
+                delay = self.backoff_seconds * 2 ** attempt * (1 + random.random())
+                logger.warning(f"{reason} fetching {url}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_fetcher: Optional[DocumentFetcher] = None
+
+
+def get_document_fetcher() -> DocumentFetcher:
+    """Process-wide `DocumentFetcher`, created on first use."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = DocumentFetcher()
+    return _fetcher
+
+
+async def close_document_fetcher() -> None:
+    global _fetcher
+    if _fetcher is not None:
+        await _fetcher.aclose()
+        _fetcher = None
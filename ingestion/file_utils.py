@@ -1,15 +1,28 @@
+import os
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 import datetime
+import io
 import constants
-import pandas as pd
 from pydantic import BaseModel
 from logger import logger
 import schema
-from tempfile import TemporaryDirectory
+import pypdf
 import requests
 from llama_index.core.schema import Document as LlamaIndexDocument
-from llama_index.readers.file import PDFReader
+from ingestion.manifest import FilingManifest, FULL_SUBMISSION_TXT, PRIMARY_DOCUMENT_PDF, PRIMARY_DOCUMENT_HTML
+from ingestion.html_utils import iter_html_pages
+from ingestion.fetcher import get_document_fetcher
+from ingestion.symbol_index import get_symbol_index
+from ingestion.parsing import get_document_parser, iter_pdf_pages
+
+# Shared by the synchronous loaders so their fallback downloads reuse connections
+_http_session = requests.Session()
+
+PRIMARY_DOCUMENTS = {
+    schema.DocumentSourceEnum.PDF: PRIMARY_DOCUMENT_PDF,
+    schema.DocumentSourceEnum.HTML: PRIMARY_DOCUMENT_HTML,
+}
 
 
 class Filing(BaseModel):
@@ -108,6 +121,7 @@ def parse_ticker_symbol_from_full_submission_txt(
     full_submission_txt_file_path: Path,
 ) -> str:
     """
+    Superseded by `filing_symbol`, kept for comparison in benchmarks.
     Very hacky approach to parsing the ticker symbol from the full-submission.txt file.
     The file usually has a line that reads something like "<FILENAME>amzn-20220930.htm"
     We can extract "amzn" from that line.
@@ -119,76 +133,271 @@ def parse_ticker_symbol_from_full_submission_txt(
     ticker_symbol = ticker_symbol_line.split("-")[0].strip()
     return ticker_symbol.upper()
 
-def get_available_filings(tickers: List[str]) -> List[Filing]:
+class SecHeader(BaseModel):
+    """
+    The subset of the full-submission.txt header that is needed to build a `Filing`.
+    """
+    cik: str
+    period_of_report_date: datetime.datetime
+    filed_as_of_date: datetime.datetime
+    date_as_of_change: datetime.datetime
+    quarter: Optional[int] = None
+
+
+_SEC_HEADER_END = b"</SEC-HEADER>"
+_SEC_HEADER_FIELDS = {
+    b"CONFORMED PERIOD OF REPORT:": "period_of_report_date",
+    b"FILED AS OF DATE:": "filed_as_of_date",
+    b"DATE AS OF CHANGE:": "date_as_of_change",
+    b"CENTRAL INDEX KEY:": "cik",
+}
+_FILENAME_TAG = b"<FILENAME>"
+_FISCAL_PERIOD_FOCUS = b"Document Fiscal Period Focus</a>"
+_SCAN_BLOCK_SIZE = 1024 * 1024
+
+
+def _scan_for_quarter(f) -> Optional[int]:
+    """
+    Scans the rest of an open full-submission.txt for the Document Fiscal Period Focus
+    in large blocks rather than line by line, since it usually sits far into the exhibits.
+    """
+    overlap = len(_FISCAL_PERIOD_FOCUS) - 1
+    buffer = b""
+    while True:
+        block = f.read(_SCAN_BLOCK_SIZE)
+        if not block:
+            return None
+        buffer = buffer[-overlap:] + block
+        index = buffer.find(_FISCAL_PERIOD_FOCUS)
+        if index != -1:
+            break
+
+    rest = buffer[index:]
+    while rest.count(b"\n") < 2:
+        block = f.read(_SCAN_BLOCK_SIZE)
+        if not block:
+            break
+        rest += block
+    lines = rest.split(b"\n", 2)
+    if len(lines) < 2:
+        return None
+    quarter = lines[1].split(b">")[1].split(b"<")[0].decode().strip("Q \r")
+    return int(quarter)
+
+
+def parse_sec_header(full_submission_txt_file_path: Path, parse_quarter: bool = False) -> SecHeader:
+    """
+    Parses everything `get_available_filings` needs from a full-submission.txt file in a single pass.
+
+    The header is read line by line up to the first <FILENAME> line after </SEC-HEADER>, which is
+    where reading stops for most filings. Only when `parse_quarter` is set does the scan continue
+    into the embedded documents to find the Document Fiscal Period Focus
+    (see `parse_quarter_from_full_submission_txt`).
+    Like the `parse_*_from_full_submission_txt` functions, the first occurrence of each field wins.
+    """
+    values = {}
+    header_done = False
+
+    with open(full_submission_txt_file_path, "rb") as f:
+        for line in f:
+            if not header_done:
+                if line.startswith(_SEC_HEADER_END):
+                    header_done = True
+                    continue
+                for key, field in _SEC_HEADER_FIELDS.items():
+                    if field not in values and key in line:
+                        values[field] = line.split(b":")[1].strip().decode()
+                        break
+            if _FILENAME_TAG in line:
+                break
+        if parse_quarter:
+            quarter = _scan_for_quarter(f)
+            if quarter is not None:
+                values["quarter"] = quarter
+
+    missing = [field for field in _SEC_HEADER_FIELDS.values() if field not in values]
+    if parse_quarter and "quarter" not in values:
+        missing.append("quarter")
+    if missing:
+        raise ValueError(f"Could not find {', '.join(missing)} in file {full_submission_txt_file_path}")
+
+    for field in ("period_of_report_date", "filed_as_of_date", "date_as_of_change"):
+        # Example value for date format: 20220930
+        values[field] = datetime.datetime.strptime(values[field], "%Y%m%d")
+    return SecHeader(**values)
+
+
+def filing_symbol(filing_dir: Path, cik: str) -> str:
+    """
+    The ticker of a filing: the ticker directory it was downloaded into when that is a known stock,
+    otherwise the ticker the symbol index has for the filer's CIK.
+    """
+    symbol_index = get_symbol_index()
+    ticker = filing_dir.parent.parent.name.upper()
+    if ticker in symbol_index:
+        return ticker
+    return symbol_index.symbol_for_cik(cik) or ticker
+
+
+def parse_filing(filing_dir: Path, filing_type: str) -> Filing:
+    """Builds a `Filing` for the primary-document.pdf of an accession directory."""
+    filing_pdf = filing_dir / PRIMARY_DOCUMENT_PDF
+    full_submission_txt = filing_dir / FULL_SUBMISSION_TXT
+    if not full_submission_txt.exists():
+        raise FileNotFoundError(f"{full_submission_txt} not found next to {filing_pdf}")
+    header = parse_sec_header(full_submission_txt, parse_quarter=filing_type == "10-Q")
+    return Filing(
+        file_path=str(filing_pdf.absolute()),
+        symbol=filing_symbol(filing_dir, header.cik),
+        filing_type=filing_type,
+        year=header.period_of_report_date.year,
+        quarter=header.quarter,
+        accession_number=filing_dir.name.strip(),
+        cik=header.cik,
+        period_of_report_date=header.period_of_report_date,
+        filed_as_of_date=header.filed_as_of_date,
+        date_as_of_change=header.date_as_of_change,
+    )
+
+
+def serialize_filing(filing_dir: Path, filing_type: str) -> str:
+    return parse_filing(filing_dir, filing_type).model_dump_json()
+
 
+def get_available_filings(
+    tickers: List[str],
+    max_workers: int = constants.FILING_DISCOVERY_WORKERS,
+    processes: bool = False,
+    source: schema.DocumentSourceEnum = schema.DocumentSourceEnum.PDF,
+) -> List[Filing]:
+    """
+    Lists the downloaded filings of the given tickers that have a primary document in the `source`
+    format, ordered by filing directory. `Filing.file_path` points at that primary document.
+
+    Filing metadata comes from the on-disk manifest, so only filing directories that are new or
+    changed since the last call have their full-submission.txt parsed, spread over `max_workers`
+    threads (or processes). Filings that cannot be parsed are logged and skipped.
+    """
     data_dir = Path(constants.DEFAULT_OUTPUT_DIR) / "sec-edgar-filings"
-    filings = []
-
-    for cik_dir in data_dir.iterdir():
-        print(cik_dir.name)
-        if cik_dir.is_dir() and (".DS_Store" not in cik_dir.name) and cik_dir.name in tickers:
-            for filing_type_dir in cik_dir.iterdir():
-                if filing_type_dir.is_dir() and ".DS_Store" not in filing_type_dir.name:
-                    for filing_dir in filing_type_dir.iterdir():
-                        if filing_dir.is_dir() and ".DS_Store" not in filing_dir.name:
-                            filing_pdf = filing_dir / "primary-document.pdf"
-                            full_submission_txt = filing_dir / "full-submission.txt"
-                            if filing_pdf.exists():
-                                filing_type = filing_type_dir.name
-                                file_path = str(filing_pdf.absolute())
-                                quarter = None
-                                assert full_submission_txt.exists()
-                                if filing_type == "10-Q":
-                                    quarter = parse_quarter_from_full_submission_txt(
-                                        full_submission_txt
-                                    )
-                                (
-                                    period_of_report_date,
-                                    filed_as_of_date,
-                                    date_as_of_change,
-                                ) = parse_dates_from_full_submission_txt(full_submission_txt)
-                                accession_number = filing_dir.name.strip()
-                                cik = parse_cik_from_full_submission_txt(full_submission_txt)
-                                symbol = parse_ticker_symbol_from_full_submission_txt(
-                                    full_submission_txt
-                                )
-                                filing = Filing(
-                                    file_path=file_path,
-                                    symbol=symbol,
-                                    filing_type=filing_type,
-                                    year=period_of_report_date.year,
-                                    quarter=quarter,
-                                    accession_number=accession_number,
-                                    cik=cik,
-                                    period_of_report_date=period_of_report_date,
-                                    filed_as_of_date=filed_as_of_date,
-                                    date_as_of_change=date_as_of_change,
-                                )
-                                filings.append(filing)
-
-    return filings
+    manifest = FilingManifest(Path(constants.DEFAULT_OUTPUT_DIR) / constants.FILINGS_MANIFEST_FILE_NAME)
+    manifest.refresh(data_dir, tickers, parse_filing=serialize_filing, max_workers=max_workers, processes=processes)
+    primary_document = PRIMARY_DOCUMENTS[source]
+    return [
+        Filing.model_validate_json(filing).model_copy(update={"file_path": str(Path(filing_dir) / primary_document)})
+        for filing_dir, filing in manifest.get_filings(tickers, primary_document)
+    ]
+
+def resolve_local_document_path(document: schema.Document) -> Optional[Path]:
+    """
+    Maps a document URL back to the filing it was uploaded from under DEFAULT_OUTPUT_DIR, the S3 keys
+    being the paths relative to that directory. Returns None when there is no readable local copy.
+    """
+    url_base = f"https://{constants.BUCKET_NAME}.s3.amazonaws.com/"
+    url = str(document.url)
+    if not url.startswith(url_base):
+        return None
+    output_dir = Path(constants.DEFAULT_OUTPUT_DIR).resolve()
+    path = (output_dir / url[len(url_base):]).resolve()
+    if output_dir in path.parents and path.is_file() and os.access(path, os.R_OK):
+        return path
+    return None
+
+
+def _fetch_document(document: schema.Document) -> bytes:
+    """Synchronous fallback for loaders called without prefetched content."""
+    response = _http_session.get(str(document.url), timeout=constants.DOCUMENT_FETCH_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.content
+
+
+async def afetch_document_content(document: schema.Document) -> Optional[bytes]:
+    """
+    Fetches a document through the shared async `DocumentFetcher` unless it has a local copy,
+    in which case None is returned and the loaders read the local file instead.
+    """
+    if resolve_local_document_path(document) is not None:
+        return None
+    return await get_document_fetcher().fetch(str(document.url))
+
+
+def iter_html(document: schema.Document, content: Optional[bytes] = None) -> Iterator[LlamaIndexDocument]:
+    """
+    Yields llama-index documents straight from a filing's html primary document, one per page.
+
+    The html is parsed from `content` when it was prefetched, otherwise the local copy is streamed
+    when present and the document is fetched from its URL as a last resort. Pages get the same
+    `page_label` metadata `PDFReader` sets, so citations keep their page numbers.
+    """
+    local_path = resolve_local_document_path(document) if content is None else None
+    if local_path is not None:
+        stream = open(local_path, "rb")
+    else:
+        stream = io.BytesIO(content if content is not None else _fetch_document(document))
+
+    file_name = Path(str(document.url)).name
+    with stream:
+        for page_number, text in iter_html_pages(stream):
+            yield LlamaIndexDocument(
+                text=text,
+                metadata={
+                    "page_label": str(page_number),
+                    "file_name": file_name,
+                    constants.DB_DOC_ID_KEY: str(document.id),
+                },
+            )
+
+
+def load_html(document: schema.Document, content: Optional[bytes] = None) -> List[LlamaIndexDocument]:
+    return list(iter_html(document, content))
+
+
+def iter_pdf(document: schema.Document, content: Optional[bytes] = None) -> Iterator[LlamaIndexDocument]:
+    """Yields a document's pdf pages one at a time, from the same sources as `load_pdf`."""
+    extra_info = {constants.DB_DOC_ID_KEY: str(document.id)}
+    if content is None:
+        local_path = resolve_local_document_path(document)
+        if local_path is not None:
+            yield from iter_pdf_pages(str(local_path), local_path.name, extra_info)
+            return
+        content = _fetch_document(document)
+    yield from iter_pdf_pages(content, Path(str(document.url)).name, extra_info)
+
+
+def _load_pdf_stream(stream: BinaryIO, file_name: str, extra_info: Dict[str, str]) -> List[LlamaIndexDocument]:
+    """Same output as `PDFReader.load_data`, for a pdf held in memory rather than on disk."""
+    pdf = pypdf.PdfReader(stream)
+    return [
+        LlamaIndexDocument(
+            text=page.extract_text(),
+            metadata={"page_label": pdf.page_labels[page_number], "file_name": file_name, **extra_info},
+        )
+        for page_number, page in enumerate(pdf.pages)
+    ]
+
 
 def load_pdf(
     # filing: Filing,
     document: schema.Document,
+    content: Optional[bytes] = None,
 ) -> List[LlamaIndexDocument]:
-    # Super hacky approach to get this to feature complete on time.
-    # TODO: Come up with better abstractions for this and the other methods in this module.
-    with TemporaryDirectory() as temp_dir:
-        temp_file_path = Path(temp_dir) / f"{str(document.id)}.pdf"
-        with open(temp_file_path, "wb") as temp_file:
-            with requests.get(str(document.url), stream=True) as r:
-                r.raise_for_status()
-                for chunk in r.iter_content(chunk_size=8192):
-                    temp_file.write(chunk)
-            temp_file.seek(0)
-            reader = PDFReader()
-            return reader.load_data(
-                temp_file_path, extra_info={
-                    constants.DB_DOC_ID_KEY: str(document.id)
-                }
-            )
-        
+    """
+    Loads a document's pdf, one llama-index document per page.
+
+    The pdf is parsed from `content` when it was prefetched (see `afetch_document_content`).
+    Otherwise, since ingestion runs on the host the filings were downloaded and converted on, it is
+    read from DEFAULT_OUTPUT_DIR when a local copy exists and only downloaded from its URL otherwise.
+    Downloaded pdfs are parsed from memory without going through a temporary file. Large pdfs are
+    parsed in page ranges on the document parser's process pool.
+    """
+    extra_info = {constants.DB_DOC_ID_KEY: str(document.id)}
+    if content is None:
+        local_path = resolve_local_document_path(document)
+        if local_path is not None:
+            logger.debug(f"Loading {document.url} from {local_path}")
+            return get_document_parser().load_pdf(str(local_path), local_path.name, extra_info)
+        content = _fetch_document(document)
+    return get_document_parser().load_pdf(content, Path(str(document.url)).name, extra_info)
+
 # def get_available_filings(output_dir: str) -> List[Filing]:
 #     data_dir = Path(output_dir) / "sec-edgar-filings"
 #     filings = []
@@ -234,6 +443,20 @@ def load_pdf(
 #     return filings
 
 
-def get_available_filings_as_df(tickers: List[str]) -> pd.DataFrame:
+# Loaders take the document and, optionally, its prefetched content
+DOCUMENT_LOADERS: Dict[schema.DocumentSourceEnum, Callable[..., List[LlamaIndexDocument]]] = {
+    schema.DocumentSourceEnum.PDF: load_pdf,
+    schema.DocumentSourceEnum.HTML: load_html,
+}
+# Lazy counterparts of the loaders, for documents ingested a window of pages at a time
+DOCUMENT_PAGE_ITERATORS: Dict[schema.DocumentSourceEnum, Callable[..., Iterator[LlamaIndexDocument]]] = {
+    schema.DocumentSourceEnum.PDF: iter_pdf,
+    schema.DocumentSourceEnum.HTML: iter_html,
+}
+
+
+def get_available_filings_as_df(tickers: List[str]) -> "pd.DataFrame":
+    import pandas as pd
+
     filings = get_available_filings(tickers=tickers)
     return pd.DataFrame([filing.dict() for filing in filings])
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Streaming text extraction for the html primary documents of SEC filings.
+
+Lets ingestion build llama-index documents straight from primary-document.html instead of rendering
+it to pdf and parsing the pdf back into text. The html is fed to the parser in chunks and pages are
+yielded as soon as they are complete, so the markup of a filing is never held in memory as a whole.
+A filing without page breaks is split into pseudo pages once it has been read, so its text (not its
+markup) is held until then.
+
+Filings come in whatever encoding their filer used: the charset they declare is used, and without
+one the text is read as UTF-8 until it turns out not to be, then as windows-1252, which most older
+EDGAR filings are.
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import constants
+
+_BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "section", "article", "blockquote",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "pre", "title",
+}
+_CELL_TAGS = {"td", "th"}
+_SKIPPED_TAGS = {"script", "style", "head", "noscript"}
+_VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "col", "area", "base", "wbr", "source"}
+_PAGE_BREAK_BEFORE = re.compile(r"(page-)?break-before\s*:\s*(always|page)", re.IGNORECASE)
+_PAGE_BREAK_AFTER = re.compile(r"(page-)?break-after\s*:\s*(always|page)", re.IGNORECASE)
+_DISPLAY_NONE = re.compile(r"display\s*:\s*none", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_SENTENCE_END = re.compile(r"(?<=[.!?]) ")
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+_XML_ENCODING = re.compile(rb"<\?xml[^>]+encoding\s*=\s*[\"']([\w.:-]+)", re.IGNORECASE)
+# Browsers read these labels as windows-1252, and so do filers' tools
+_WINDOWS_1252_LABELS = {"latin-1", "iso-8859-1", "iso8859-1", "ascii", "us-ascii", "cp1252", "windows-1252"}
+
+
+def _normalize(text: str) -> str:
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+class HtmlPageExtractor(HTMLParser):
+    """
+    Incremental html to text parser that splits the text into pseudo pages.
+
+    SEC filings mark the pages of their printed version with `page-break-before/after` styles, which
+    is where wkhtmltopdf starts a new pdf page too, so those are used as page boundaries. Hidden
+    content (inline XBRL headers in `display:none` blocks, scripts and styles) is skipped.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._pages: List[str] = []
+        # One (tag, breaks page after, hides content) entry per open element
+        self._stack: List[Tuple[str, bool, bool]] = []
+        self._hidden_depth = 0
+        self.page_breaks = 0
+
+    def _break_page(self) -> None:
+        text = _normalize("".join(self._parts))
+        # Adjacent break-after / break-before styles produce a single break, as they do when printing
+        if not text:
+            return
+        self._pages.append(text)
+        self._parts = []
+        self.page_breaks += 1
+
+    def handle_starttag(self, tag, attrs):
+        style = dict(attrs).get("style") or ""
+        hidden = tag in _SKIPPED_TAGS or bool(_DISPLAY_NONE.search(style))
+        if not self._hidden_depth and _PAGE_BREAK_BEFORE.search(style):
+            self._break_page()
+        if tag in _VOID_TAGS:
+            if not self._hidden_depth:
+                if tag in _BLOCK_TAGS:
+                    self._parts.append("\n")
+                if _PAGE_BREAK_AFTER.search(style):
+                    self._break_page()
+            return
+        self._stack.append((tag, bool(_PAGE_BREAK_AFTER.search(style)), hidden))
+        if hidden:
+            self._hidden_depth += 1
+        elif not self._hidden_depth and tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        # Pop up to the matching start tag, which also closes elements whose end tags were omitted
+        while self._stack:
+            open_tag, break_after, hidden = self._stack.pop()
+            if hidden:
+                self._hidden_depth -= 1
+            elif not self._hidden_depth:
+                if open_tag in _BLOCK_TAGS:
+                    self._parts.append("\n")
+                elif open_tag in _CELL_TAGS:
+                    self._parts.append(" ")
+                if break_after:
+                    self._break_page()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self._hidden_depth:
+            self._parts.append(data.replace("\n", " "))
+
+    def pop_pages(self) -> List[str]:
+        pages, self._pages = self._pages, []
+        return pages
+
+    def close(self) -> List[str]:
+        """Flushes the parser and returns the remaining pages, the last of which may be empty."""
+        super().close()
+        self._pages.append(_normalize("".join(self._parts)))
+        self._parts = []
+        return self.pop_pages()
+
+
+def _pieces(text: str, page_chars: int) -> Iterator[Tuple[str, str]]:
+    """
+    (separator, piece) pairs that rebuild `text`: its paragraphs, and for a paragraph longer than
+    `page_chars` (flattened html often has a single one) its sentences, words or slices of a word,
+    so that no piece is longer than `page_chars`.
+    """
+    for i, paragraph in enumerate(text.split("\n")):
+        separator = "\n" if i else ""
+        if len(paragraph) <= page_chars:
+            yield separator, paragraph
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            words = [sentence] if len(sentence) <= page_chars else sentence.split(" ")
+            for word in words:
+                for start in range(0, len(word), page_chars):
+                    yield separator, word[start:start + page_chars]
+                    separator = ""
+                separator = " "
+
+
+def _split_text(text: str, page_chars: int) -> Iterator[str]:
+    """
+    Splits text without page breaks into pseudo pages of at most `page_chars`, at paragraph
+    boundaries where possible, else at sentence or word boundaries.
+    """
+    page: List[str] = []
+    size = 0
+    for separator, piece in _pieces(text, page_chars):
+        if size and size + len(separator) + len(piece) > page_chars:
+            yield "".join(page)
+            page, size = [], 0
+        if not page:
+            separator = ""
+        page.append(separator + piece)
+        size += len(separator) + len(piece)
+    if page:
+        yield "".join(page)
+
+
+def sniff_encoding(head: bytes) -> Optional[str]:
+    """The encoding a document's first bytes declare through a byte order mark, `<meta>` or xml declaration."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    match = _META_CHARSET.search(head) or _XML_ENCODING.search(head)
+    if match is None:
+        return None
+    label = match.group(1).decode("ascii").lower()
+    if label in _WINDOWS_1252_LABELS:
+        return "cp1252"
+    try:
+        return codecs.lookup(label).name
+    except LookupError:
+        return None
+
+
+class _Utf8OrWindows1252Decoder:
+    """Incremental decoder that reads UTF-8 until an invalid sequence, then windows-1252 from there on."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.encoding = "utf-8"
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        if self.encoding == "utf-8":
+            pending, _ = self._decoder.getstate()
+            try:
+                return self._decoder.decode(data, final)
+            except UnicodeDecodeError:
+                # What came before was ASCII or valid UTF-8, so only the rest is read differently
+                self._decoder = codecs.getincrementaldecoder("cp1252")(errors="replace")
+                self.encoding = "cp1252"
+                data = pending + data
+        return self._decoder.decode(data, final)
+
+
+def _decoder_for(encoding: Optional[str]):
+    if encoding is None or codecs.lookup(encoding).name == "utf-8":
+        return _Utf8OrWindows1252Decoder()
+    return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+
+def iter_html_pages(
+    stream: BinaryIO,
+    encoding: Optional[str] = None,
+    chunk_size: int = 64 * 1024,
+    page_chars: int = constants.HTML_PSEUDO_PAGE_CHARS,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page number, text) for the pages of an html document read from `stream`, numbered from 1.
+
+    Pages come from the page breaks in the document. A document without any page breaks is split into
+    pseudo pages of about `page_chars` characters instead, so citations still point somewhere useful.
+    Without an `encoding`, the one the document declares is used (see the module docstring).
+    """
+    extractor = HtmlPageExtractor()
+    chunk = stream.read(chunk_size)
+    decoder = _decoder_for(encoding or sniff_encoding(chunk))
+    page_number = 0
+    while True:
+        extractor.feed(decoder.decode(chunk, final=not chunk))
+        for page in extractor.pop_pages():
+            page_number += 1
+            yield page_number, page
+        if not chunk:
+            break
+        chunk = stream.read(chunk_size)
+
+    last_page = extractor.close()[-1]
+    if extractor.page_breaks == 0:
+        for page in _split_text(last_page, page_chars):
+            page_number += 1
+            yield page_number, page
+    elif last_page:
+        yield page_number + 1, last_page
@@ -0,0 +1,189 @@
+"""
+On-disk manifest of the downloaded SEC filings.
+
+`get_available_filings` used to walk every `sec-edgar-filings/<ticker>/<type>/<accession>` directory
+and re-parse every full-submission.txt on each request. The manifest is a small SQLite database
+keyed by accession directory that remembers the mtime and size of the files a `Filing` is built
+from, so only new or changed filing directories get parsed again.
+"""
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from logger import logger
+
+SCHEMA_VERSION = 4
+FULL_SUBMISSION_TXT = "full-submission.txt"
+PRIMARY_DOCUMENT_PDF = "primary-document.pdf"
+PRIMARY_DOCUMENT_HTML = "primary-document.html"
+
+# (mtime_ns, size) of full-submission.txt, primary-document.pdf and primary-document.html
+Fingerprint = Tuple[Optional[int], ...]
+_PRIMARY_DOCUMENT_COLUMNS = {
+    PRIMARY_DOCUMENT_PDF: "pdf_mtime_ns",
+    PRIMARY_DOCUMENT_HTML: "html_mtime_ns",
+}
+
+
+def _stat(path: Path) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None, None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def filing_fingerprint(filing_dir: Path) -> Fingerprint:
+    return (
+        *_stat(filing_dir / FULL_SUBMISSION_TXT),
+        *_stat(filing_dir / PRIMARY_DOCUMENT_PDF),
+        *_stat(filing_dir / PRIMARY_DOCUMENT_HTML),
+    )
+
+
+def _parse_isolated(
+    parse_filing: Callable[[Path, str], str], filing_dir: Path, filing_type: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """Runs `parse_filing` in a pool worker, turning a failure into an error message for that filing only."""
+    try:
+        return parse_filing(filing_dir, filing_type), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def iter_filing_dirs(ticker_dir: Path) -> Iterator[Tuple[str, Path]]:
+    """Yields (filing type, accession directory) pairs below a ticker directory."""
+    for filing_type_dir in ticker_dir.iterdir():
+        if filing_type_dir.is_dir() and ".DS_Store" not in filing_type_dir.name:
+            for filing_dir in filing_type_dir.iterdir():
+                if filing_dir.is_dir() and ".DS_Store" not in filing_dir.name:
+                    yield filing_type_dir.name, filing_dir
+
+
+class FilingManifest:
+    """
+    SQLite backed manifest of filing directories.
+
+    Each row stores the directory fingerprint and the serialized filing built from it (NULL when the
+    directory has no full-submission.txt yet). Rows are indexed by ticker, so listing the filings for
+    a handful of tickers never touches the directories of other tickers.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # The manifest is only a cache of what is on disk, so an outdated schema is simply rebuilt.
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS filings")
+                conn.execute(
+                    """
+                    CREATE TABLE filings (
+                        filing_dir TEXT PRIMARY KEY,
+                        ticker TEXT NOT NULL,
+                        filing_type TEXT NOT NULL,
+                        submission_mtime_ns INTEGER,
+                        submission_size INTEGER,
+                        pdf_mtime_ns INTEGER,
+                        pdf_size INTEGER,
+                        html_mtime_ns INTEGER,
+                        html_size INTEGER,
+                        filing TEXT,
+                        error TEXT
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX filings_ticker ON filings (ticker)")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return conn
+
+    def refresh(
+        self,
+        data_dir: Path,
+        tickers: List[str],
+        parse_filing: Callable[[Path, str], str],
+        max_workers: int = 1,
+        processes: bool = False,
+    ) -> int:
+        """
+        Brings the rows of the given tickers in line with the filing directories on disk.
+
+        Fingerprinting and `parse_filing(filing_dir, filing_type)` are spread over a pool of
+        `max_workers` threads (or processes, in which case `parse_filing` must be picklable).
+        `parse_filing` is only called for directories that are new or whose fingerprint changed,
+        and must return the serialized filing. A filing that fails to parse is recorded with its
+        error and left out of `get_filings` until its files change, without affecting the others.
+        Returns the number of directories that were parsed.
+        """
+        with closing(self._connect()) as conn:
+            known: Dict[str, Fingerprint] = {}
+            candidates = []
+            for ticker in tickers:
+                for row in conn.execute(
+                    "SELECT filing_dir, submission_mtime_ns, submission_size, pdf_mtime_ns, pdf_size, "
+                    "html_mtime_ns, html_size "
+                    "FROM filings WHERE ticker = ?",
+                    (ticker,),
+                ):
+                    known[row[0]] = tuple(row[1:])
+                ticker_dir = data_dir / ticker
+                if ticker_dir.is_dir():
+                    for filing_type, filing_dir in iter_filing_dirs(ticker_dir):
+                        candidates.append((str(filing_dir.absolute()), ticker, filing_type, filing_dir))
+
+            pool_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with pool_cls(max_workers=max(1, max_workers)) as pool:
+                fingerprints = list(pool.map(filing_fingerprint, [c[3] for c in candidates]))
+                changed = [
+                    (*candidate, fingerprint)
+                    for candidate, fingerprint in zip(candidates, fingerprints)
+                    if known.pop(candidate[0], None) != fingerprint
+                ]
+                to_parse = [c for c in changed if c[4][0] is not None]
+                results = dict(zip(
+                    [c[0] for c in to_parse],
+                    pool.map(
+                        _parse_isolated,
+                        [parse_filing] * len(to_parse),
+                        [c[3] for c in to_parse],
+                        [c[2] for c in to_parse],
+                    ),
+                ))
+
+            with conn:
+                conn.executemany("DELETE FROM filings WHERE filing_dir = ?", [(key,) for key in known])
+                for key, ticker, filing_type, filing_dir, fingerprint in changed:
+                    filing, error = results.get(key, (None, None))
+                    if error:
+                        logger.warning(f"Could not parse filing in {filing_dir}: {error}")
+                    conn.execute(
+                        "INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, ticker, filing_type, *fingerprint, filing, error),
+                    )
+            if changed or known:
+                logger.info(
+                    f"Manifest for {', '.join(tickers)}: {len(changed)} new or changed, {len(known)} removed, "
+                    f"{sum(1 for _, error in results.values() if error)} failed"
+                )
+            return len(results)
+
+    def get_filings(self, tickers: List[str], primary_document: str = PRIMARY_DOCUMENT_PDF) -> List[Tuple[str, str]]:
+        """
+        Returns (filing directory, serialized filing) pairs for the given tickers whose directory
+        contains `primary_document`, ordered by filing directory.
+        """
+        if not tickers:
+            return []
+        placeholders = ", ".join("?" for _ in tickers)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT filing_dir, filing FROM filings WHERE ticker IN ({placeholders}) AND filing IS NOT NULL "
+                f"AND {_PRIMARY_DOCUMENT_COLUMNS[primary_document]} IS NOT NULL ORDER BY filing_dir",
+                list(tickers),
+            )
+            return [(row[0], row[1]) for row in rows]
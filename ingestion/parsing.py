@@ -0,0 +1,193 @@
+"""
+Process-parallel pdf parsing and chunking.
+
+Text extraction with pypdf and sentence splitting are pure Python and hold the GIL, so a 300-page
+10-K parsed on the ingestion executor's threads keeps a single core busy. `DocumentParser` splits
+a pdf into page ranges and a document's pages into slices and spreads them over a process pool.
+Results are put back together in page order, with the same `page_label`, `file_name` and
+`db_document_id` metadata as the sequential path.
+
+The workers only import this module, pypdf and llama-index core, so they start without the LLM
+clients.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pypdf
+from llama_index.core import Settings
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, Document as LlamaIndexDocument
+
+import constants
+from logger import logger
+
+# A pdf path, or the pdf itself when it was fetched
+PdfSource = Union[str, bytes]
+
+
+@lru_cache(maxsize=1)
+def get_node_parser() -> SentenceSplitter:
+    """The splitter `LLM.node_parser` configures, built once per process."""
+    return SentenceSplitter.from_defaults(
+        chunk_size=constants.NODE_PARSER_CHUNK_SIZE,
+        chunk_overlap=constants.NODE_PARSER_CHUNK_OVERLAP,
+    )
+
+
+def _open_pdf(source: PdfSource) -> pypdf.PdfReader:
+    return pypdf.PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _page_documents(
+    pdf: pypdf.PdfReader, file_name: str, extra_info: Dict[str, str], start: int, page_labels: Sequence[str]
+) -> List[LlamaIndexDocument]:
+    return [
+        LlamaIndexDocument(
+            text=pdf.pages[start + i].extract_text(),
+            metadata={"page_label": page_label, "file_name": file_name, **extra_info},
+        )
+        for i, page_label in enumerate(page_labels)
+    ]
+
+
+def extract_pdf_pages(
+    source: PdfSource, file_name: str, extra_info: Dict[str, str], start: int = 0, stop: Optional[int] = None
+) -> List[LlamaIndexDocument]:
+    """Same output as `PDFReader.load_data` for pages `start` to `stop` of a pdf."""
+    pdf = _open_pdf(source)
+    return _page_documents(pdf, file_name, extra_info, start, pdf.page_labels[start:stop])
+
+
+def _extract_page_range(
+    path: str, file_name: str, extra_info: Dict[str, str], start: int, page_labels: List[str]
+) -> List[LlamaIndexDocument]:
+    # Runs in a worker: the pdf is read from disk and its labels come from the parent, so a task
+    # neither receives the whole pdf nor resolves every page of it
+    return _page_documents(pypdf.PdfReader(path), file_name, extra_info, start, page_labels)
+
+
+@contextmanager
+def _pdf_path(source: PdfSource) -> Iterator[str]:
+    """A path to the pdf, written once to a temporary file when it was fetched."""
+    if not isinstance(source, bytes):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as file:
+        file.write(source)
+    try:
+        yield file.name
+    finally:
+        os.unlink(file.name)
+
+
+def iter_pdf_pages(source: PdfSource, file_name: str, extra_info: Dict[str, str]) -> Iterator[LlamaIndexDocument]:
+    """The lazy counterpart of `extract_pdf_pages`, yielding one page at a time."""
+    pdf = _open_pdf(source)
+    page_labels = pdf.page_labels
+    for page_number, page in enumerate(pdf.pages):
+        text = page.extract_text()
+        # pypdf keeps every object it resolved, content streams included; dropping them after each
+        # page keeps the reader from growing with the document (they are re-read when needed)
+        pdf.resolved_objects.clear()
+        yield LlamaIndexDocument(
+            text=text,
+            metadata={"page_label": page_labels[page_number], "file_name": file_name, **extra_info},
+        )
+
+
+def chunk_pages(pages: List[LlamaIndexDocument]) -> List[BaseNode]:
+    # llama-index's default transformations, as the sequential path has always chunked with them,
+    # so documents indexed here split like the ones already in the vector collection
+    return run_transformations(pages, Settings.transformations)
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+
+class DocumentParser:
+    def __init__(
+        self,
+        max_workers: Optional[int] = constants.PARSE_PROCESS_WORKERS,
+        pages_per_task: int = constants.PARSE_PAGES_PER_TASK,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked, as the server process runs threads and an event loop
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _in_thread(self, page_count: int) -> bool:
+        # A single worker process would only add the cost of sending pages back and forth
+        return self.max_workers <= 1 or page_count <= self.pages_per_task
+
+    def load_pdf(self, source: PdfSource, file_name: str, extra_info: Dict[str, str]) -> List[LlamaIndexDocument]:
+        """
+        Extracts a pdf's pages, one llama-index document per page. Pdfs of up to `pages_per_task`
+        pages are parsed in the calling thread.
+        """
+        pdf = _open_pdf(source)
+        page_labels = pdf.page_labels
+        if self._in_thread(len(page_labels)):
+            return _page_documents(pdf, file_name, extra_info, 0, page_labels)
+        pool = self._get_pool()
+        with _pdf_path(source) as path:
+            futures = [
+                pool.submit(_extract_page_range, path, file_name, extra_info, start, page_labels[start:stop])
+                for start, stop in page_ranges(len(page_labels), self.pages_per_task)
+            ]
+            logger.debug(f"Parsing {file_name}: {len(page_labels)} pages in {len(futures)} tasks")
+            return [page for future in futures for page in future.result()]
+
+    def chunk(self, pages: List[LlamaIndexDocument]) -> List[BaseNode]:
+        """
+        Splits pages into nodes with llama-index's default transformations, in page order. Pages
+        are split on their own, so slices of pages can be split in different processes.
+        """
+        if self._in_thread(len(pages)):
+            return chunk_pages(pages)
+        pool = self._get_pool()
+        futures = [pool.submit(chunk_pages, pages[start:stop]) for start, stop in page_ranges(len(pages), self.pages_per_task)]
+        return [node for future in futures for node in future.result()]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+_document_parser: Optional[DocumentParser] = None
+_document_parser_lock = threading.Lock()
+
+
+def get_document_parser() -> DocumentParser:
+    global _document_parser
+    with _document_parser_lock:
+        if _document_parser is None:
+            # The production server sets this to share the cores between its worker processes
+            max_workers = int(os.environ.get("PARSE_PROCESS_WORKERS", 0)) or constants.PARSE_PROCESS_WORKERS
+            _document_parser = DocumentParser(max_workers=max_workers)
+        return _document_parser
+
+
+def shutdown_document_parser() -> None:
+    global _document_parser
+    with _document_parser_lock:
+        if _document_parser is not None:
+            _document_parser.shutdown()
+            _document_parser = None
@@ -0,0 +1,177 @@
+"""
+Staged pipeline for ingestion.
+
+Each `Stage` runs its own number of worker tasks and reads from a bounded queue fed by the stage
+before it, so network-bound stages (storing, fetching, embedding) overlap with CPU-bound ones
+(parsing, chunking) instead of one document going through all of them before the next starts.
+A full queue makes the stage feeding it wait, which bounds how far ahead fast stages run and how
+many documents are held in memory at once.
+
+Stage functions are coroutines; blocking work inside them belongs on an executor.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from logger import logger
+
+_END = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    concurrency: int
+    queue_size: int
+    processed: int = 0
+    dropped: int = 0
+    busy_seconds: float = 0.0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def throughput(self) -> float:
+        """Items per second since the stage received its first item."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "throughput": round(self.throughput, 2),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_size": self.queue_size,
+            "busy_seconds": round(self.busy_seconds, 2),
+        }
+
+
+@dataclass
+class Stage:
+    """
+    `fn` is awaited with one item, or with a list of up to `batch_size` items when batching, and
+    returns what goes on to the next stage: one item (a list of items when batching), or None to
+    drop it. A batch is handed over when it is full, when the stage before has finished, or once
+    `batch_timeout` seconds pass without a new item.
+    """
+
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    queue_size: int = 16
+    batch_size: int = 1
+    batch_timeout: float = 1.0
+    stats: StageStats = field(init=False)
+
+    def __post_init__(self):
+        self.stats = StageStats(self.name, self.concurrency, self.queue_size)
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [stage.stats.as_dict() for stage in self.stages]
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{s.name}: {s.stats.processed} items at {s.stats.throughput:.2f}/s "
+            f"(max queue {s.stats.max_queue_depth}/{s.queue_size})"
+            for s in self.stages
+        )
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, stats: StageStats, item: Any) -> None:
+        await queue.put(item)
+        stats.queue_depth = queue.qsize()
+        stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+
+    async def _next_batch(self, stage: Stage, queue: asyncio.Queue) -> List[Any]:
+        """Takes up to `batch_size` items; the list ends with `_END` once the stage before has finished."""
+        batch = [await queue.get()]
+        while batch[-1] is not _END and len(batch) < stage.batch_size:
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=stage.batch_timeout))
+            except asyncio.TimeoutError:
+                break
+        stage.stats.queue_depth = queue.qsize()
+        return batch
+
+    async def _worker(self, index: int, queues: List[asyncio.Queue]) -> None:
+        stage = self.stages[index]
+        stats = stage.stats
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(self.stages) else None
+        next_stats = self.stages[index + 1].stats if outbox is not None else None
+        while True:
+            batch = await self._next_batch(stage, inbox)
+            finished = batch[-1] is _END
+            items = batch[:-1] if finished else batch
+            if items:
+                if stats.started_at is None:
+                    stats.started_at = time.perf_counter()
+                start = time.perf_counter()
+                result = await stage.fn(items if stage.batch_size > 1 else items[0])
+                stats.busy_seconds += time.perf_counter() - start
+                stats.processed += len(items)
+                outputs = (result or []) if stage.batch_size > 1 else ([] if result is None else [result])
+                stats.dropped += len(items) - len(outputs)
+                if outbox is not None:
+                    for output in outputs:
+                        await self._put(outbox, next_stats, output)
+            if finished:
+                return
+
+    async def _run_stage(self, index: int, queues: List[asyncio.Queue]) -> None:
+        stage = self.stages[index]
+        workers = [asyncio.create_task(self._worker(index, queues)) for _ in range(stage.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        stage.stats.finished_at = time.perf_counter()
+        if index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].concurrency):
+                await queues[index + 1].put(_END)
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterable[Any]]) -> None:
+        """
+        Feeds `items` through every stage and returns once all of them are processed. The first
+        exception raised by a stage cancels the whole pipeline and is raised here.
+        """
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        first = self.stages[0]
+
+        async def feed() -> None:
+            if isinstance(items, AsyncIterable):
+                async for item in items:
+                    await self._put(queues[0], first.stats, item)
+            else:
+                for item in items:
+                    await self._put(queues[0], first.stats, item)
+            for _ in range(first.concurrency):
+                await queues[0].put(_END)
+
+        tasks = [asyncio.create_task(feed())] + [
+            asyncio.create_task(self._run_stage(i, queues)) for i in range(len(self.stages))
+        ]
+        try:
+            # FIRST_EXCEPTION returns as soon as a stage fails, rather than once the rest drain
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"Pipeline finished: {self.summary()}")
@@ -0,0 +1,162 @@
+"""
+Process-wide S3 uploader.
+
+One boto3 client and its connection pool are shared by every upload, uploads run in parallel with
+tuned multipart settings, and files whose content is already in the bucket are skipped: first by a
+local record of what was uploaded (no hashing needed while a file's mtime and size are unchanged),
+then by comparing the file's content hash with the remote ETag.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import constants
+from logger import logger
+
+MB = 1024 * 1024
+
+
+@dataclass
+class UploadResult:
+    file_path: str
+    key: str
+    uploaded: bool = False
+    skipped: bool = False
+    error: Optional[str] = None
+
+
+def s3_key_for(file_path: str) -> str:
+    """S3 keys mirror the paths below the data directory, which is what document URLs are built from."""
+    return file_path.split('data/')[1]
+
+
+def s3_etag(file_path: str, multipart_threshold: int, multipart_chunksize: int) -> str:
+    """
+    The ETag S3 reports for `file_path` when uploaded with the given multipart settings: the MD5 of the
+    content for single part uploads, the MD5 of the part MD5s suffixed with the part count otherwise.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        if size < multipart_threshold:
+            return hashlib.md5(f.read()).hexdigest()
+        part_digests = [hashlib.md5(part).digest() for part in iter(lambda: f.read(multipart_chunksize), b"")]
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+class S3Uploader:
+    def __init__(
+        self,
+        bucket: str = constants.BUCKET_NAME,
+        record_path: Optional[Path] = None,
+        max_workers: int = constants.S3_UPLOAD_WORKERS,
+        multipart_threshold: int = constants.S3_MULTIPART_THRESHOLD_MB * MB,
+        multipart_chunksize: int = constants.S3_MULTIPART_CHUNKSIZE_MB * MB,
+        multipart_concurrency: int = constants.S3_MULTIPART_CONCURRENCY,
+        client=None,
+    ):
+        # boto3 is imported by the first uploader rather than by every process importing this module
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.max_workers = max_workers
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=multipart_concurrency,
+        )
+        self.client = client or boto3.client(
+            's3',
+            aws_access_key_id=os.environ.get("AWS_ACCESS_KEY"),
+            aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY"),
+            # Points the uploader at a local S3 stand-in, such as moto, when set
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL"),
+            config=Config(max_pool_connections=max_workers * multipart_concurrency),
+        )
+        self.record_path = Path(record_path or Path(constants.DEFAULT_OUTPUT_DIR) / constants.S3_UPLOAD_RECORD_FILE_NAME)
+        self._record_lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads "
+                "(bucket TEXT, key TEXT, mtime_ns INTEGER, size INTEGER, etag TEXT, PRIMARY KEY (bucket, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        self.record_path.parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(self.record_path, timeout=30)
+
+    def _recorded(self, key: str) -> Optional[Tuple[int, int, str]]:
+        with self._record_lock, closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT mtime_ns, size, etag FROM uploads WHERE bucket = ? AND key = ?", (self.bucket, key)
+            ).fetchone()
+
+    def _record(self, key: str, mtime_ns: int, size: int, etag: str) -> None:
+        with self._record_lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)", (self.bucket, key, mtime_ns, size, etag)
+            )
+
+    def _remote_etag(self, key: str) -> Optional[str]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)["ETag"].strip('"')
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def upload(self, file_path: str, key: Optional[str] = None) -> UploadResult:
+        """Uploads one file unless the bucket already holds the same content under its key."""
+        key = key or s3_key_for(file_path)
+        result = UploadResult(file_path=file_path, key=key)
+        try:
+            stat = os.stat(file_path)
+            recorded = self._recorded(key)
+            if recorded is not None and recorded[:2] == (stat.st_mtime_ns, stat.st_size):
+                result.skipped = True
+                return result
+
+            etag = s3_etag(file_path, self.transfer_config.multipart_threshold, self.transfer_config.multipart_chunksize)
+            if self._remote_etag(key) == etag:
+                result.skipped = True
+            else:
+                self.client.upload_file(file_path, self.bucket, key, Config=self.transfer_config)
+                result.uploaded = True
+                logger.info(f"File uploaded successfully to s3://{self.bucket}/{key}")
+            self._record(key, stat.st_mtime_ns, stat.st_size, etag)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Error uploading {file_path} to s3://{self.bucket}/{key}: {result.error}")
+        return result
+
+    def upload_many(self, file_paths: List[str]) -> List[UploadResult]:
+        """Uploads files in parallel, returning one result per file in the given order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(self.upload, file_paths))
+        logger.info(
+            f"S3 uploads: {sum(r.uploaded for r in results)} uploaded, {sum(r.skipped for r in results)} unchanged, "
+            f"{sum(r.error is not None for r in results)} failed"
+        )
+        return results
+
+
+_uploader: Optional[S3Uploader] = None
+_uploader_lock = threading.Lock()
+
+
+def get_s3_uploader() -> S3Uploader:
+    """Process-wide `S3Uploader`, created on first use."""
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = S3Uploader()
+        return _uploader
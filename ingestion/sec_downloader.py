@@ -0,0 +1,329 @@
+"""
+Concurrent, rate-limited downloader for SEC EDGAR filings.
+
+Writes the same layout sec-edgar-downloader produces
+(`<output_dir>/sec-edgar-filings/<ticker>/<form>/<accession number>/full-submission.txt` and
+`primary-document.html`), but shares one HTTP session and one rate limiter across a bounded worker
+pool instead of downloading each (ticker, filing type) pair serially.
+The EDGAR base URLs are configurable so it can run against a local stand-in.
+"""
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+import constants
+from logger import logger
+
+ROOT_SAVE_FOLDER_NAME = "sec-edgar-filings"
+FULL_SUBMISSION_FILENAME = "full-submission.txt"
+PRIMARY_DOC_FILENAME_STEM = "primary-document"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Called with an event name and a message as work items complete, from worker threads
+ProgressCallback = Callable[[str, str], None]
+
+
+def no_progress(event: str, message: str) -> None:
+    pass
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `acquire` blocks until a token is available, so every thread sharing
+    the bucket stays under `rate` requests per second with bursts of at most `capacity`. The default
+    capacity of one spaces requests evenly, which keeps any one second window within the limit.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class FilingToDownload:
+    ticker: str
+    form: str
+    accession_number: str
+    raw_filing_url: str
+    primary_doc_url: str
+    primary_doc_suffix: str
+
+
+@dataclass
+class DownloadReport:
+    filings: int = 0
+    downloaded_files: int = 0
+    skipped_files: int = 0
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class EdgarClient:
+    """
+    Thin EDGAR API client. One pooled, keep-alive `requests.Session` is shared by all workers and
+    every request goes through the shared `TokenBucket`. Throttled (429), server error and connection
+    failures are retried with exponential backoff and jitter, honouring Retry-After when present.
+    """
+
+    def __init__(
+        self,
+        company_name: str = constants.SEC_EDGAR_COMPANY_NAME,
+        email: str = constants.SEC_EDGAR_EMAIL,
+        www_url: str = constants.SEC_EDGAR_WWW_URL,
+        data_url: str = constants.SEC_EDGAR_DATA_URL,
+        requests_per_second: float = constants.SEC_EDGAR_REQUESTS_PER_SECOND,
+        pool_size: int = constants.SEC_DOWNLOAD_WORKERS,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        timeout: float = 60,
+    ):
+        self.www_url = www_url.rstrip("/")
+        self.data_url = data_url.rstrip("/")
+        self.limiter = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": f"{company_name} {email}",
+            "Accept-Encoding": "gzip, deflate",
+        })
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._ticker_to_cik: Optional[Dict[str, str]] = None
+        self._ticker_to_cik_lock = threading.Lock()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def get(self, url: str) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{type(e).__name__} fetching {url}, retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                logger.warning(f"HTTP {response.status_code} fetching {url}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_seconds * 2 ** attempt * (1 + random.random())
+
+    def ticker_to_cik(self) -> Dict[str, str]:
+        """Ticker to zero-padded CIK mapping, fetched once per client."""
+        with self._ticker_to_cik_lock:
+            if self._ticker_to_cik is None:
+                metadata = self.get(f"{self.www_url}/files/company_tickers_exchange.json").json()
+                cik_idx = metadata["fields"].index("cik")
+                ticker_idx = metadata["fields"].index("ticker")
+                self._ticker_to_cik = {
+                    str(row[ticker_idx]).upper(): str(row[cik_idx]).zfill(10) for row in metadata["data"]
+                }
+            return self._ticker_to_cik
+
+    def list_filings(
+        self,
+        ticker: str,
+        form: str,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> List[FilingToDownload]:
+        """
+        Lists the most recent filings of a form for a ticker, newest first, optionally limited to
+        filing dates between `after` and `before` (inclusive, YYYY-MM-DD). Amendments are left out.
+        """
+        cik = self.ticker_to_cik().get(ticker.upper())
+        if cik is None:
+            raise ValueError(f"Ticker {ticker} not found in the EDGAR ticker to CIK mapping")
+
+        filings: List[FilingToDownload] = []
+        submissions_url = f"{self.data_url}/submissions/CIK{cik}.json"
+        additional_pages = None
+        while limit is None or len(filings) < limit:
+            response_json = self.get(submissions_url).json()
+            # The first page nests the recent filings and lists further pages for companies with >1000 filings
+            if additional_pages is None:
+                page = response_json["filings"]["recent"]
+                additional_pages = deque(response_json["filings"].get("files", []))
+            else:
+                page = response_json
+
+            for accession_number, filing_form, document, filing_date in zip(
+                page["accessionNumber"], page["form"], page["primaryDocument"], page["filingDate"]
+            ):
+                if filing_form != form or (after and filing_date < after) or (before and filing_date > before):
+                    continue
+                filings.append(self._to_download(ticker, form, cik, accession_number, document))
+                if limit is not None and len(filings) == limit:
+                    break
+
+            if not additional_pages:
+                break
+            submissions_url = f"{self.data_url}/submissions/{additional_pages.popleft()['name']}"
+        return filings
+
+    def _to_download(self, ticker: str, form: str, cik: str, accession_number: str, document: str) -> FilingToDownload:
+        base_url = f"{self.www_url}/Archives/edgar/data/{cik.lstrip('0')}/{accession_number.replace('-', '')}"
+        return FilingToDownload(
+            ticker=ticker,
+            form=form,
+            accession_number=accession_number,
+            raw_filing_url=f"{base_url}/{accession_number}.txt",
+            # Primary documents can be prefixed with an XSL rendering path, only the file name is wanted
+            primary_doc_url=f"{base_url}/{document.rsplit('/')[-1]}",
+            primary_doc_suffix=Path(document).suffix.replace("htm", "html"),
+        )
+
+
+_client: Optional[EdgarClient] = None
+_client_lock = threading.Lock()
+
+
+def get_edgar_client() -> EdgarClient:
+    """
+    Process-wide `EdgarClient`, so every download shares one connection pool and one rate limiter.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = EdgarClient()
+        return _client
+
+
+def _save(content: bytes, save_path: Path) -> None:
+    # Write to a temporary name first so an interrupted download never looks complete
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = save_path.with_name(f".{save_path.name}.part")
+    temp_path.write_bytes(content)
+    temp_path.replace(save_path)
+
+
+class ConcurrentDownloader:
+    """
+    Downloads filings for many (ticker, filing type) pairs on a bounded thread pool sharing one
+    `EdgarClient`, so connections are reused and the SEC rate limit holds across all workers.
+    """
+
+    def __init__(self, output_dir: str, client: Optional[EdgarClient] = None, max_workers: int = constants.SEC_DOWNLOAD_WORKERS):
+        self.output_dir = Path(output_dir)
+        self.client = client or get_edgar_client()
+        self.max_workers = max_workers
+
+    def _download_filing(self, filing: FilingToDownload) -> Tuple[int, int]:
+        filing_dir = self.output_dir / ROOT_SAVE_FOLDER_NAME / filing.ticker / filing.form / filing.accession_number
+        downloaded = skipped = 0
+        for url, filename in (
+            (filing.raw_filing_url, FULL_SUBMISSION_FILENAME),
+            (filing.primary_doc_url, f"{PRIMARY_DOC_FILENAME_STEM}{filing.primary_doc_suffix}"),
+        ):
+            save_path = filing_dir / filename
+            if save_path.exists():
+                skipped += 1
+                continue
+            _save(self.client.get(url).content, save_path)
+            downloaded += 1
+        return downloaded, skipped
+
+    def download(
+        self,
+        pairs: List[Tuple[str, str]],
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        progress: ProgressCallback = no_progress,
+    ) -> DownloadReport:
+        """
+        Downloads the filings of every (ticker, filing type) pair. A failure is recorded in the
+        report and does not stop the other pairs or filings.
+        `progress` is told about every listed (ticker, filing type) pair, every downloaded filing and
+        every ticker whose filings are all done.
+        """
+        report = DownloadReport()
+        start = time.perf_counter()
+        # Listings and filing downloads still outstanding per ticker
+        outstanding = Counter(ticker for ticker, _ in pairs)
+
+        def finish(ticker: str) -> None:
+            outstanding[ticker] -= 1
+            if outstanding[ticker] == 0:
+                progress("ticker", f"Finished downloading filings for {ticker}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            listings = {
+                pool.submit(self.client.list_filings, ticker, form, limit, before, after): (ticker, form)
+                for ticker, form in pairs
+            }
+            downloads = {}
+            for future in as_completed(listings):
+                ticker, form = listings[future]
+                try:
+                    filings = future.result()
+                except Exception as e:
+                    report.errors.append(f"Listing {ticker} {form}: {e}")
+                    progress("error", report.errors[-1])
+                    finish(ticker)
+                    continue
+                progress("listed", f"Found {len(filings)} {form} filings for {ticker}")
+                outstanding[ticker] += len(filings)
+                for filing in filings:
+                    downloads[pool.submit(self._download_filing, filing)] = filing
+                finish(ticker)
+
+            for future in tqdm(as_completed(downloads), total=len(downloads), desc="Downloading filings"):
+                filing = downloads[future]
+                try:
+                    downloaded, skipped = future.result()
+                except Exception as e:
+                    report.errors.append(f"Downloading {filing.ticker} {filing.form} {filing.accession_number}: {e}")
+                    progress("error", report.errors[-1])
+                else:
+                    report.filings += 1
+                    report.downloaded_files += downloaded
+                    report.skipped_files += skipped
+                    progress("downloaded", f"Downloaded {filing.ticker} {filing.form} {filing.accession_number}")
+                finish(filing.ticker)
+
+        report.seconds = time.perf_counter() - start
+        for error in report.errors:
+            logger.error(error)
+        logger.info(
+            f"Downloaded {report.filings} filings ({report.downloaded_files} files, {report.skipped_files} already present) "
+            f"in {report.seconds:.1f}s with {len(report.errors)} errors"
+        )
+        return report
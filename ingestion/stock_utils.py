@@ -1,7 +1,6 @@
 from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ValidationError
-from pytickersymbols import PyTickerSymbols
 
 DEFAULT_INDICES = ["DOW JONES", "S&P 500", "NASDAQ 100"]
 
@@ -12,7 +11,7 @@ class Stock(BaseModel):
     indices: List[str]
 
 
-def _parse_stock(stock: dict) -> Optional[Stock]:
+def parse_stock(stock: dict) -> Optional[Stock]:
     try:
         return Stock(
             name=stock["name"],
@@ -24,6 +23,9 @@ def _parse_stock(stock: dict) -> Optional[Stock]:
 
 
 def get_stocks(indices: List[str] = DEFAULT_INDICES) -> List[Stock]:
+    # Imported here as loading its dataset is most of the cost of building the symbol index
+    from pytickersymbols import PyTickerSymbols
+
     stock_data = PyTickerSymbols()
     if indices:
         # get stocks for given indices
@@ -35,7 +37,7 @@ def get_stocks(indices: List[str] = DEFAULT_INDICES) -> List[Stock]:
         # get stocks for all indices
         all_stocks = stock_data.get_all_stocks()
 
-    stocks = [_parse_stock(stock) for stock in all_stocks]
+    stocks = [parse_stock(stock) for stock in all_stocks]
     return list(filter(None, stocks))
 
 
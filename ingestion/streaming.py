@@ -0,0 +1,65 @@
+"""
+Streaming ingestion of large documents.
+
+The batched path holds all of a document's pages, then all of its nodes and their embeddings,
+before anything is written, so peak memory grows with the largest filing times the number of
+documents in flight. Here pages are read lazily and handled a window at a time: each window is
+chunked and handed to `index_window` (which stores, embeds and writes it) before the next one is
+read, so memory stays roughly constant whatever the document's size.
+
+Pages are chunked on their own (nodes only link to nodes of the same page), so windows of whole
+pages give the same nodes and node ids as chunking the document at once.
+"""
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+from llama_index.core.schema import BaseNode, Document as LlamaIndexDocument
+
+import constants
+from ingestion.content_hash import ChunkIdAssigner, TextHasher, assign_page_ids
+from ingestion.parsing import get_document_parser
+from logger import logger
+
+T = TypeVar("T")
+
+
+def windows(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while window := list(islice(iterator, size)):
+        yield window
+
+
+@dataclass
+class StreamedDocument:
+    pages: int = 0
+    text_sha256: str = ""
+    # Ids of all the document's nodes, in order
+    chunks: List[str] = field(default_factory=list)
+
+
+def stream_document_pages(
+    doc_id: str,
+    pages: Iterable[LlamaIndexDocument],
+    index_window: Callable[[List[LlamaIndexDocument], List[BaseNode]], None],
+    window_size: int = constants.INGESTION_PAGE_WINDOW,
+) -> StreamedDocument:
+    """
+    Reads `pages` `window_size` at a time, gives them stable page ids, chunks them with the
+    default transformations and calls `index_window(pages, nodes)` for each window. Nothing of a
+    window is kept afterwards except the ids of its nodes.
+    """
+    result = StreamedDocument()
+    text_hasher = TextHasher()
+    chunk_ids = ChunkIdAssigner(doc_id)
+    for window in windows(pages, window_size):
+        assign_page_ids(doc_id, window, first_page_index=result.pages)
+        result.pages += len(window)
+        text_hasher.update(window)
+        nodes = get_document_parser().chunk(window)
+        chunk_ids.assign(nodes)
+        result.chunks.extend(node.node_id for node in nodes)
+        index_window(window, nodes)
+    result.text_sha256 = text_hasher.hexdigest()
+    logger.debug(f"Streamed {doc_id}: {result.pages} pages, {len(result.chunks)} nodes")
+    return result
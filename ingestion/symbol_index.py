@@ -0,0 +1,135 @@
+"""
+Ticker and CIK lookups for ingestion.
+
+Every ingestion request used to build `PyTickerSymbols()` and turn the whole dataset into `Stock`
+models again. The symbol index maps ticker to `Stock` and CIK to ticker; it is built once, stored
+as JSON next to the filings manifest and loaded once per process. It is rebuilt when the installed
+pytickersymbols version changes.
+"""
+import json
+import os
+import threading
+from importlib.metadata import version
+from pathlib import Path
+from typing import Dict, Optional
+
+import constants
+from ingestion.stock_utils import Stock, parse_stock
+from logger import logger
+
+SCHEMA_VERSION = 1
+
+
+def _dataset_version() -> str:
+    return f"{SCHEMA_VERSION}:{version('pytickersymbols')}"
+
+
+def normalize_cik(cik: str) -> str:
+    return str(cik).strip().zfill(10)
+
+
+class SymbolIndex:
+    def __init__(self, stocks: Dict[str, Stock], cik_to_symbol: Optional[Dict[str, str]] = None):
+        self.stocks = stocks
+        self.cik_to_symbol = {normalize_cik(cik): symbol for cik, symbol in (cik_to_symbol or {}).items()}
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.stocks
+
+    def __len__(self) -> int:
+        return len(self.stocks)
+
+    def stock(self, symbol: str) -> Optional[Stock]:
+        return self.stocks.get(symbol.upper())
+
+    def symbol_for_cik(self, cik: str) -> Optional[str]:
+        return self.cik_to_symbol.get(normalize_cik(cik))
+
+    def add_ciks(self, ticker_to_cik: Dict[str, str]) -> int:
+        """
+        Adds the CIKs of known tickers and returns how many were new. Share classes of one company
+        (GOOG and GOOGL) share a CIK; the first ticker seen keeps it.
+        """
+        added = 0
+        for ticker, cik in ticker_to_cik.items():
+            ticker = ticker.upper()
+            if ticker in self.stocks and normalize_cik(cik) not in self.cik_to_symbol:
+                self.cik_to_symbol[normalize_cik(cik)] = ticker
+                added += 1
+        return added
+
+    def save(self, path: Path) -> None:
+        data = {
+            "version": _dataset_version(),
+            "stocks": {symbol: stock.model_dump() for symbol, stock in self.stocks.items()},
+            "ciks": self.cik_to_symbol,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first so a concurrent reader never sees half of it
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps(data, separators=(",", ":")))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["SymbolIndex"]:
+        """Returns None when there is no index at `path` or it was built from another dataset."""
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get("version") != _dataset_version():
+            return None
+        stocks = {symbol: Stock(**stock) for symbol, stock in data["stocks"].items()}
+        return cls(stocks, data["ciks"])
+
+
+def build_symbol_index(ticker_to_cik: Optional[Dict[str, str]] = None) -> SymbolIndex:
+    """Builds the index from the pytickersymbols dataset and, optionally, EDGAR's ticker to CIK mapping."""
+    from pytickersymbols import PyTickerSymbols
+
+    stocks = {}
+    for stock in filter(None, map(parse_stock, PyTickerSymbols().get_all_stocks())):
+        stocks.setdefault(stock.symbol, stock)
+    index = SymbolIndex(stocks)
+    if ticker_to_cik:
+        index.add_ciks(ticker_to_cik)
+    return index
+
+
+_symbol_index: Optional[SymbolIndex] = None
+_symbol_index_lock = threading.Lock()
+
+
+def _symbol_index_path() -> Path:
+    return Path(constants.DEFAULT_OUTPUT_DIR) / constants.SYMBOL_INDEX_FILE_NAME
+
+
+def get_symbol_index() -> SymbolIndex:
+    """Loads the stored symbol index, building and storing it on first use."""
+    global _symbol_index
+    with _symbol_index_lock:
+        if _symbol_index is None:
+            path = _symbol_index_path()
+            _symbol_index = SymbolIndex.load(path)
+            if _symbol_index is None:
+                _symbol_index = build_symbol_index()
+                try:
+                    _symbol_index.save(path)
+                except OSError as e:
+                    logger.warning(f"Could not store the symbol index at {path}: {e}")
+            logger.info(f"Symbol index loaded: {len(_symbol_index)} stocks, {len(_symbol_index.cik_to_symbol)} CIKs")
+        return _symbol_index
+
+
+def update_symbol_index_ciks(ticker_to_cik: Dict[str, str]) -> None:
+    """Adds CIKs learned from EDGAR to the symbol index and stores it if any were new."""
+    index = get_symbol_index()
+    with _symbol_index_lock:
+        added = index.add_ciks(ticker_to_cik)
+        if added:
+            try:
+                index.save(_symbol_index_path())
+            except OSError as e:
+                logger.warning(f"Could not store the symbol index: {e}")
+    if added:
+        logger.info(f"Added {added} CIKs to the symbol index")
@@ -1,42 +1,72 @@
 import os
-from llama_index.llms.openai import OpenAI
-import constants 
+from functools import cached_property
+
+import constants
+from ingestion.parsing import get_node_parser
 # from llama_index.question_gen.guidance import GuidanceQuestionGenerator
-from llama_index.core.node_parser import SentenceSplitter
-from guidance.models import OpenAI as GuidanceOpenAI
-from llama_index.embeddings.openai import (
-    OpenAIEmbedding,
-    OpenAIEmbeddingMode,
-    OpenAIEmbeddingModelType
-)
 # question_gen = GuidanceQuestionGenerator.from_defaults(
 #     guidance_llm=GuidanceOpenAI("text-davinci-003"), verbose=False
 # )
 
-class LLM:
-    guidanceLLM = GuidanceOpenAI("gpt-4")
-
-    llm = OpenAI(
-        temperature=0,
-        model=constants.OPENAI_TOOL_LLM_NAME,
-        streaming=False,
-        api_key=os.environ["OPENAI_API_KEY"],
-    )
-    chat_llm = OpenAI(
-        temperature=0,
-        model=constants.OPENAI_TOOL_LLM_NAME,
-        streaming=True,
-        api_key=os.environ["OPENAI_API_KEY"],
-    )
-
-    embedding_model = OpenAIEmbedding(
-        mode=OpenAIEmbeddingMode.SIMILARITY_MODE,
-        model_type=OpenAIEmbeddingModelType.TEXT_EMBED_ADA_002,
-        api_key=os.environ["OPENAI_API_KEY"],
-    )
-    # Use a smaller chunk size to retrieve more granular results
-    node_parser = SentenceSplitter.from_defaults(
-        chunk_size=constants.NODE_PARSER_CHUNK_SIZE,
-        chunk_overlap=constants.NODE_PARSER_CHUNK_OVERLAP,
-        # callback_manager=callback_manager,
-    )
+
+class _LLMClients:
+    """
+    The LLM clients, each built on first use. Building them imports the OpenAI and guidance SDKs,
+    and the guidance model downloads its tokenizer, so a process that never calls a model does not
+    pay for them. `warm_up` builds the ones ingestion needs ahead of the first request.
+    """
+
+    @cached_property
+    def guidanceLLM(self):
+        from guidance.models import OpenAI as GuidanceOpenAI
+
+        return GuidanceOpenAI("gpt-4")
+
+    @cached_property
+    def llm(self):
+        from llama_index.llms.openai import OpenAI
+
+        return OpenAI(
+            temperature=0,
+            model=constants.OPENAI_TOOL_LLM_NAME,
+            streaming=False,
+            api_key=os.environ["OPENAI_API_KEY"],
+        )
+
+    @cached_property
+    def chat_llm(self):
+        from llama_index.llms.openai import OpenAI
+
+        return OpenAI(
+            temperature=0,
+            model=constants.OPENAI_TOOL_LLM_NAME,
+            streaming=True,
+            api_key=os.environ["OPENAI_API_KEY"],
+        )
+
+    @cached_property
+    def embedding_model(self):
+        from llama_index.embeddings.openai import (
+            OpenAIEmbedding,
+            OpenAIEmbeddingMode,
+            OpenAIEmbeddingModelType
+        )
+
+        return OpenAIEmbedding(
+            mode=OpenAIEmbeddingMode.SIMILARITY_MODE,
+            model_type=OpenAIEmbeddingModelType.TEXT_EMBED_ADA_002,
+            api_key=os.environ["OPENAI_API_KEY"],
+        )
+
+    @property
+    def node_parser(self):
+        # Use a smaller chunk size to retrieve more granular results
+        # Shared with the ingestion parse workers, see `ingestion.parsing`
+        return get_node_parser()
+
+    def warm_up(self) -> None:
+        self.embedding_model
+        self.node_parser
+
+
+LLM = _LLMClients()
@@ -180,6 +180,7 @@ class DocumentMetadataKeysEnum(str, Enum):
     """
 
     SEC_DOCUMENT = "sec_document"
+    CONTENT_HASHES = "content_hashes"
 
 # 11
 class SecDocumentTypeEnum(str, Enum):
@@ -191,6 +192,29 @@ class SecDocumentTypeEnum(str, Enum):
     TEN_Q = "10-Q"
     ANNUAL_REPORT="Annual Report"
 
+# 11.1
+class DocumentSourceEnum(str, Enum):
+    """
+    Enum for the file a sec document's text is extracted from during ingestion
+    """
+
+    PDF = "pdf"
+    HTML = "html"
+
+# 11.2
+class DocumentContentHashes(BaseModel):
+    """
+    What a document's stored index was built from, to tell on re-ingestion which parts changed
+    """
+
+    source_sha256: Optional[str] = None
+    source_size: Optional[int] = None
+    source_mtime_ns: Optional[int] = None
+    text_sha256: str
+    pages: int = 0
+    # Content-addressed ids of the document's nodes, see `ingestion.content_hash.assign_chunk_ids`
+    chunks: List[str] = Field(default_factory=list)
+
 # 12
 class SecDocumentMetadata(BaseModel):
     """
@@ -282,6 +306,37 @@ class Conversation(Base):
 class ConversationCreate(BaseModel):
     document_ids: Optional[List[PyObjectId]] = None
 
+# 17
+class IngestionJobStatusEnum(str, Enum):
+    """
+    Enum for the status of a background ingestion job
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+# 18
+class IngestionJob(BaseModel):
+    """
+    A background ingestion job. Its progress events are stored separately, numbered by `event_count`.
+    """
+
+    id: str
+    tickers: List[str]
+    source: DocumentSourceEnum = DocumentSourceEnum.PDF
+    status: IngestionJobStatusEnum = IngestionJobStatusEnum.QUEUED
+    attempts: int = 0
+    # URLs of the documents already stored and indexed, skipped when an interrupted job resumes
+    completed_filings: List[str] = Field(default_factory=list)
+    event_count: int = 0
+    error: Optional[str] = None
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 
 if __name__ == "__main__":
     # print(Document(_id= ObjectId("66f77e3bbae8b95b9c053482"), url="http://www.google.com"))
@@ -1,14 +1,46 @@
+import argparse
+import importlib.util
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from api.api import api_router
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import constants
 from logger import logger
+from api.deps import get_mongo_client, close_mongo_client
+from ingestion.fetcher import close_document_fetcher
+from api.storage import close_storage_context
+from api.executor import shutdown_ingestion_executor
+from api.jobs import start_job_workers, stop_job_workers
+from api.lifecycle import start_warm_up, stop_warm_up
+from ingestion.parsing import shutdown_document_parser
+from ingestion.embedding import shutdown_batch_embedder
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker process, so each opens its own Mongo pool and loads its own models
+    logger.info(f"Starting worker process {os.getpid()}")
+    get_mongo_client()
+    start_warm_up()
+    start_job_workers()
+    yield
+    await stop_warm_up()
+    await stop_job_workers()
+    shutdown_ingestion_executor()
+    shutdown_document_parser()
+    shutdown_batch_embedder()
+    await close_document_fetcher()
+    close_storage_context()
+    close_mongo_client()
+
 
 app = FastAPI(
     title="FinAILLM",
-    swagger_ui_parameters={"syntaxHighlight": False}
+    swagger_ui_parameters={"syntaxHighlight": False},
     # openapi_url=f"{settings.API_PREFIX}/openapi.json",
-    # lifespan=lifespan,
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -19,26 +51,52 @@ app.add_middleware(
 )
 app.include_router(api_router, prefix="/api")
 
+def _resolve(option: str, module: str, fallback: str) -> str:
+    # "auto" picks the faster implementation when it is installed, as uvicorn itself does
+    if option != "auto":
+        return option
+    return module if importlib.util.find_spec(module) else fallback
+
+
 def start():
-    print("Running in AppEnvironment: " + "Dev")
-    # __setup_logging(settings.LOG_LEVEL)
-    
-    """Launched with `poetry run start` at root level"""
-    # if settings.RENDER:
-    #     # on render.com deployments, run migrations
-    #     logger.debug("Running migrations")
-    #     alembic_args = ["--raiseerr", "upgrade", "head"]
-    #     alembic.config.main(argv=alembic_args)
-    #     logger.debug("Migrations complete")
-    # else:
-    #     logger.debug("Skipping migrations")
-    # live_reload = not settings.RENDER
+    """Launched with `python server.py` at root level; `--production` runs several worker processes."""
+    parser = argparse.ArgumentParser(description="Runs the ingestion API server.")
+    parser.add_argument("--production", action="store_true", help="worker processes, no reload, no access log")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", constants.SERVER_WORKERS)))
+    parser.add_argument("--host", default=constants.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=constants.SERVER_PORT)
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default="auto")
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default="auto")
+    args = parser.parse_args()
+
+    if not args.production:
+        print("Running in AppEnvironment: " + "Dev")
+        uvicorn.run(
+            "server:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            workers=1,
+        )
+        return
+
+    job_store = os.environ.get("INGESTION_JOB_STORE", constants.INGESTION_JOB_STORE)
+    if args.workers > 1 and job_store == "memory":
+        # Each worker would only see the jobs it created itself
+        parser.error("the memory job store needs a single worker, use --workers 1 or INGESTION_JOB_STORE=mongo")
+    # Share the cores between the workers' parse pools instead of each starting one per core
+    os.environ.setdefault("PARSE_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+    loop = _resolve(args.loop, "uvloop", "asyncio")
+    http = _resolve(args.http, "httptools", "h11")
+    print(f"Running in AppEnvironment: Production ({args.workers} workers, {loop} loop, {http} http)")
     uvicorn.run(
         "server:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        workers=1,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        access_log=False,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import io
+
+from ingestion.html_utils import iter_html_pages, sniff_encoding
+
+SENTENCE = "Net sales increased during the period primarily due to higher sales of products and services."
+
+
+def html_pages(html: str, page_chars: int):
+    return [text for _, text in iter_html_pages(io.BytesIO(html.encode()), page_chars=page_chars)]
+
+
+def test_long_single_line_body_is_split_into_pseudo_pages():
+    body = " ".join([SENTENCE] * 200)
+    pages = html_pages(f"<html><body><p>{body}</p></body></html>", page_chars=1000)
+
+    assert len(pages) > 1
+    assert all(len(page) <= 1000 for page in pages)
+    # Split at sentence boundaries, and nothing is lost
+    assert all(page.endswith(".") for page in pages)
+    assert " ".join(pages) == body
+
+
+def test_paragraphs_stay_whole_when_they_fit():
+    paragraphs = [" ".join([SENTENCE] * 3) for _ in range(20)]
+    html = "<html><body>" + "".join(f"<p>{p}</p>" for p in paragraphs) + "</body></html>"
+    pages = html_pages(html, page_chars=1000)
+
+    assert all(len(page) <= 1000 for page in pages)
+    assert [p for page in pages for p in page.split("\n") if p] == paragraphs
+
+
+def test_words_longer_than_a_page_are_cut():
+    word = "x" * 2500
+    pages = html_pages(f"<html><body><p>{SENTENCE} {word}</p></body></html>", page_chars=1000)
+
+    assert all(len(page) <= 1000 for page in pages)
+    assert "".join(pages).replace(" ", "") == (SENTENCE + word).replace(" ", "")
+
+
+QUOTED = "The Company’s “services” segment – net sales"
+
+
+def html_bytes_pages(html: bytes, chunk_size: int = 64 * 1024):
+    return [text for _, text in iter_html_pages(io.BytesIO(html), chunk_size=chunk_size)]
+
+
+def test_undeclared_windows_1252_is_not_replaced():
+    html = f"<html><body><p>{QUOTED}</p></body></html>".encode("cp1252")
+
+    assert html_bytes_pages(html) == [QUOTED]
+
+
+def test_declared_charset_is_used():
+    html = (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1"></head>'
+        f"<body><p>{QUOTED}</p></body></html>"
+    ).encode("cp1252")
+
+    assert sniff_encoding(html) == "cp1252"
+    assert html_bytes_pages(html) == [QUOTED]
+
+
+def test_utf8_split_across_chunks():
+    html = f"<html><body><p>{QUOTED}</p></body></html>".encode("utf-8")
+
+    assert html_bytes_pages(html, chunk_size=7) == [QUOTED]
+
+
+def test_windows_1252_after_utf8_looking_start():
+    html = ("<html><body><p>" + "Net sales. " * 2000 + f"{QUOTED}</p></body></html>").encode("cp1252")
+
+    assert html_bytes_pages(html, chunk_size=1024)[-1].endswith(QUOTED)